@@ -1,7 +1,11 @@
-from flask import Flask
+from flask import Flask, Response, request, jsonify, g, send_file
 from flask_cors import CORS
-from app.models.database import init_db
+from app.models.database import init_db, begin_request_stats, end_request_stats, get_db_metrics
+from app.services.metrics import Metrics, METRICS_ENABLED
+from app.services.profiler import RequestProfiler
+from app.services.admission import Admission
 import os
+import time
 from dotenv import load_dotenv
 
 def create_app(config=None):
@@ -11,7 +15,8 @@ def create_app(config=None):
     load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
     
     # CORS configuration
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    # Expose the pagination headers so cross-origin clients can follow them
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=['X-Next-Cursor', 'Link'])
     
     # Ensure storage directory exists
     os.makedirs('storage/projects', exist_ok=True)
@@ -28,4 +33,82 @@ def create_app(config=None):
     app.register_blueprint(project_bp)
     app.register_blueprint(audio_bp)
     
+    # Per-request database instrumentation
+    @app.before_request
+    def start_db_stats():
+        begin_request_stats()
+    
+    @app.after_request
+    def add_db_stats(response):
+        stats = end_request_stats(request.endpoint)
+        if app.debug and stats:
+            response.headers['X-DB-Statements'] = str(stats['statements'])
+            response.headers['X-DB-Time-Ms'] = f"{stats['total_time'] * 1000:.2f}"
+            if stats['slowest_statement']:
+                response.headers['X-DB-Slowest-Ms'] = f"{stats['slowest_time'] * 1000:.2f}"
+                response.headers['X-DB-Slowest'] = ' '.join(stats['slowest_statement'].split())[:200]
+        return response
+    
+    @app.route('/api/db/stats', methods=['GET'])
+    def db_stats():
+        """Get aggregated database statement metrics"""
+        return jsonify(get_db_metrics()), 200
+    
+    @app.route('/api/admission/stats', methods=['GET'])
+    def admission_stats():
+        """Get running, queued and rejected counts for each admission class"""
+        return jsonify(Admission.stats()), 200
+    
+    # Per-route latency, status and in-flight metrics
+    if METRICS_ENABLED:
+        @app.before_request
+        def start_request_metrics():
+            g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+            g.metrics_started = time.perf_counter()
+            Metrics.request_started(g.metrics_route)
+        
+        @app.after_request
+        def record_request_metrics(response):
+            if 'metrics_started' in g:
+                Metrics.request_finished(g.metrics_route, request.method, response.status_code,
+                                         time.perf_counter() - g.metrics_started)
+            return response
+        
+        @app.teardown_request
+        def end_request_metrics(exc):
+            if 'metrics_started' in g:
+                Metrics.request_done(g.metrics_route)
+        
+        @app.route('/metrics', methods=['GET'])
+        def metrics():
+            """Get request, pipeline and cache metrics in the Prometheus text format"""
+            return Response(Metrics.render(), mimetype='text/plain; version=0.0.4')
+    
+    # On-demand sampling profiles for requests that present PROFILE_TOKEN
+    if RequestProfiler.enabled():
+        @app.before_request
+        def start_profile():
+            if RequestProfiler.authorized(request.headers.get('X-Profile') or request.args.get('profile')):
+                g.profile = RequestProfiler.start()
+        
+        @app.after_request
+        def attach_profile(response):
+            profile = g.pop('profile', None)
+            if profile is not None:
+                response.headers['X-Profile-Id'] = profile.id
+                response.headers['X-Profile-Url'] = f'/api/profiles/{profile.id}'
+                # Keep sampling until a streamed body has been sent
+                response.call_on_close(profile.finish)
+            return response
+        
+        @app.route('/api/profiles/<profile_id>', methods=['GET'])
+        def get_profile(profile_id):
+            """Download a request profile in the collapsed-stack format"""
+            if not RequestProfiler.authorized(request.headers.get('X-Profile') or request.args.get('profile')):
+                return jsonify({'error': 'Profile token required'}), 403
+            path = RequestProfiler.profile_path(profile_id)
+            if not path:
+                return jsonify({'error': 'Profile not found'}), 404
+            return send_file(path, mimetype='text/plain', download_name=f'{profile_id}.collapsed')
+    
     return app
@@ -0,0 +1,157 @@
+import json
+import os
+import re
+import time
+from urllib.parse import parse_qs
+from app.services.metrics import Metrics, METRICS_ENABLED
+
+
+# Threads serving the Flask routes that have no async handler
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 16))
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the async handlers need"""
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+
+    async def body(self) -> bytes:
+        chunks = []
+        while True:
+            message = await self.receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def json(self):
+        body = await self.body()
+        return json.loads(body) if body else None
+
+
+class AsyncResponse:
+    """A response whose body is bytes, str, or an async iterator of str chunks"""
+
+    def __init__(self, body=b'', status: int = 200, mimetype: str = 'application/json', headers: dict = None):
+        self.body = body
+        self.status = status
+        self.headers = [(b'content-type', mimetype.encode())] + CORS_HEADERS
+        for name, value in (headers or {}).items():
+            self.headers.append((name.lower().encode(), str(value).encode()))
+
+    async def __call__(self, send):
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': self.headers})
+        if isinstance(self.body, (bytes, str)):
+            body = self.body.encode() if isinstance(self.body, str) else self.body
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        try:
+            async for chunk in self.body:
+                await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        except OSError:
+            # Client went away mid-stream
+            pass
+        finally:
+            await self.body.aclose()
+
+
+def json_response(data, status: int = 200) -> AsyncResponse:
+    return AsyncResponse(json.dumps(data), status)
+
+
+class AsyncRouter:
+    """Map method and path patterns ('/scenes/<scene_id>') to async handlers"""
+
+    def __init__(self):
+        self.routes = []
+
+    def route(self, path: str, methods=('GET',)):
+        pattern = re.compile('^' + re.sub(r'<(\w+)>', r'(?P<\1>[^/]+)', path) + '$')
+
+        def decorator(handler):
+            self.routes.append((path, pattern, tuple(methods), handler))
+            return handler
+        return decorator
+
+    def match(self, method: str, path: str):
+        """Return (route, handler, path params), (route, None, allowed methods) for OPTIONS, or None"""
+        for route, pattern, methods, handler in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if method in methods:
+                return route, handler, match.groupdict()
+            if method == 'OPTIONS':
+                return route, None, methods
+        return None
+
+
+def create_asgi_app(flask_app):
+    """Serve the async routes natively and every other route through flask_app on a thread pool"""
+    from a2wsgi import WSGIMiddleware
+    from app.routes.async_routes import router
+
+    wsgi = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await _lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http':
+            match = router.match(scope['method'], scope['path'])
+            if match is not None:
+                route, handler, params = match
+                if handler is None:
+                    response = AsyncResponse(status=204, headers={
+                        'Access-Control-Allow-Methods': ', '.join(params),
+                        'Access-Control-Allow-Headers': 'Content-Type'
+                    })
+                    await response(send)
+                    return
+                
+                if METRICS_ENABLED:
+                    started_at = time.perf_counter()
+                    Metrics.request_started(route)
+                try:
+                    try:
+                        response = await handler(AsyncRequest(scope, receive), **params)
+                    except Exception as e:
+                        print(f"Error handling {scope['method']} {scope['path']}: {e}")
+                        response = json_response({'error': str(e)}, 500)
+                    if METRICS_ENABLED:
+                        Metrics.request_finished(route, scope['method'], response.status, time.perf_counter() - started_at)
+                    await response(send)
+                finally:
+                    if METRICS_ENABLED:
+                        Metrics.request_done(route)
+                return
+
+        await wsgi(scope, receive, send)
+
+    return app
+
+
+async def _lifespan(receive, send):
+    from app.services.render_pool import RenderPool
+    from app.services.warmup import start_warmup
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            start_warmup()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            RenderPool.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,34 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from app.models.database import query_db, execute_db, execute_many_db
+
+
+class AsyncDB:
+    """Awaitable database access for the async server.
+
+    sqlite3 has no non-blocking API, so statements run on a small dedicated
+    thread pool: the event loop never blocks on the database, and however
+    many connections are waiting, only ASYNC_DB_THREADS threads touch it.
+    """
+
+    THREADS = int(os.getenv('ASYNC_DB_THREADS', 4))
+
+    _executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='async-db')
+
+    @staticmethod
+    async def run(fn, *args):
+        """Await a blocking database function, such as a SceneCache lookup"""
+        return await asyncio.get_running_loop().run_in_executor(AsyncDB._executor, fn, *args)
+
+    @staticmethod
+    async def query(query, args=(), one=False):
+        return await AsyncDB.run(query_db, query, args, one)
+
+    @staticmethod
+    async def execute(query, args=()):
+        await AsyncDB.run(execute_db, query, args)
+
+    @staticmethod
+    async def execute_many(query, rows):
+        await AsyncDB.run(execute_many_db, query, list(rows))
@@ -1,9 +1,31 @@
 import sqlite3
 import os
+import re
 import json
+import time
+import logging
+import threading
 from datetime import datetime
 
 DB_PATH = 'storage/projects/animation.db'
+# Rows per keyset page when streaming large result sets
+STREAM_ARRAYSIZE = int(os.getenv('DB_STREAM_ARRAYSIZE', 64))
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'storage/logs/slow_queries.log')
+FTS_ENABLED = False
+
+slow_query_logger = logging.getLogger('app.db.slow')
+
+_request_stats = threading.local()
+_metrics_lock = threading.Lock()
+_metrics = {
+    'statements': 0,
+    'total_time': 0.0,
+    'slow_statements': 0,
+    'slowest_time': 0.0,
+    'slowest_statement': None,
+    'endpoints': {}
+}
 
 def get_db():
     db = sqlite3.connect(DB_PATH)
@@ -30,6 +52,10 @@ def init_db():
         )
     ''')
     
+    # Keyset pagination indexes for project listing
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects(updated_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_projects_status_updated ON projects(status, updated_at, id)')
+    
     # Stories table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS stories (
@@ -68,6 +94,9 @@ def init_db():
     if 'title' not in columns:
         cursor.execute('ALTER TABLE scenes ADD COLUMN title TEXT')
     
+    # Keyset order for paging through a project's scenes
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scenes_project_sequence ON scenes(project_id, IFNULL(sequence, 0), id)')
+    
     # Characters table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS characters (
@@ -111,23 +140,257 @@ def init_db():
             FOREIGN KEY (character_id) REFERENCES characters(id)
         )
     ''')
-    
+
+    # Cache version counters (cross-process cache invalidation)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('scenes', 0)")
+
+    # Measured narration lengths used to fit the duration model
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS duration_samples (
+            audio_key TEXT PRIMARY KEY,
+            words INTEGER NOT NULL,
+            syllables INTEGER NOT NULL,
+            pauses INTEGER NOT NULL,
+            stops INTEGER NOT NULL,
+            rate INTEGER NOT NULL,
+            duration REAL NOT NULL,
+            engine TEXT,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute("PRAGMA table_info(duration_samples)")
+    if 'engine' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE duration_samples ADD COLUMN engine TEXT')
+        # Earlier samples may come from the silent stand-in engine; they cannot be told apart
+        cursor.execute('DELETE FROM duration_samples')
+
+    init_search_index(cursor)
+
     db.commit()
     db.close()
 
+def init_search_index(cursor):
+    """Create the FTS5 index over stories and scene narration and its sync triggers.
+
+    Stories are indexed on their title and prompt (stories.description), not
+    on stories.content: that is the serialized scene list, whose JSON keys
+    and narration would match nearly every query and duplicate scene hits.
+
+    Index rowids are derived from the source rowids (scenes even, stories
+    odd) so triggers can update and delete entries without a table scan.
+    Rowids of the source tables can change on VACUUM, so run
+    rebuild_search_index() after vacuuming.
+    """
+    global FTS_ENABLED
+    
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+    exists = cursor.fetchone() is not None
+    
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                title,
+                body,
+                project_id UNINDEXED,
+                source_type UNINDEXED,
+                source_id UNINDEXED,
+                tokenize = 'porter unicode61'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search disabled, FTS5 unavailable: {e}")
+        FTS_ENABLED = False
+        return
+    FTS_ENABLED = True
+    
+    # Titles weigh more than body text
+    cursor.execute("INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(4.0, 1.0)')")
+    
+    # Replace story triggers from before stories were indexed on their prompt
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'stories_search_insert'")
+    row = cursor.fetchone()
+    stale = row is not None and 'new.content' in row[0]
+    if stale:
+        cursor.execute('DROP TRIGGER stories_search_insert')
+        cursor.execute('DROP TRIGGER IF EXISTS stories_search_update')
+    
+    cursor.executescript('''
+        CREATE TRIGGER IF NOT EXISTS scenes_search_insert AFTER INSERT ON scenes BEGIN
+            INSERT INTO search_index (rowid, title, body, project_id, source_type, source_id)
+            VALUES (new.rowid * 2, new.title, new.narration, new.project_id, 'scene', new.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS scenes_search_update AFTER UPDATE OF title, narration, project_id ON scenes BEGIN
+            UPDATE search_index SET title = new.title, body = new.narration, project_id = new.project_id
+            WHERE rowid = new.rowid * 2;
+        END;
+        CREATE TRIGGER IF NOT EXISTS scenes_search_delete AFTER DELETE ON scenes BEGIN
+            DELETE FROM search_index WHERE rowid = old.rowid * 2;
+        END;
+        CREATE TRIGGER IF NOT EXISTS stories_search_insert AFTER INSERT ON stories BEGIN
+            INSERT INTO search_index (rowid, title, body, project_id, source_type, source_id)
+            VALUES (new.rowid * 2 + 1, new.title, new.description, new.project_id, 'story', new.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS stories_search_update AFTER UPDATE OF title, description, project_id ON stories BEGIN
+            UPDATE search_index SET title = new.title, body = new.description, project_id = new.project_id
+            WHERE rowid = new.rowid * 2 + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS stories_search_delete AFTER DELETE ON stories BEGIN
+            DELETE FROM search_index WHERE rowid = old.rowid * 2 + 1;
+        END;
+    ''')
+    
+    # Backfill rows written before the index existed or under the old story triggers
+    if not exists or stale:
+        rebuild_search_index(cursor)
+
+def rebuild_search_index(cursor):
+    """Repopulate the full-text index from the stories and scenes tables"""
+    cursor.execute('DELETE FROM search_index')
+    cursor.execute('''
+        INSERT INTO search_index (rowid, title, body, project_id, source_type, source_id)
+        SELECT rowid * 2, title, narration, project_id, 'scene', id FROM scenes
+    ''')
+    cursor.execute('''
+        INSERT INTO search_index (rowid, title, body, project_id, source_type, source_id)
+        SELECT rowid * 2 + 1, title, description, project_id, 'story', id FROM stories
+    ''')
+
+def begin_request_stats():
+    """Start collecting statement statistics for the current request"""
+    _request_stats.stats = {'statements': 0, 'total_time': 0.0, 'slowest_time': 0.0, 'slowest_statement': None}
+
+def end_request_stats(endpoint=None) -> dict:
+    """Stop collecting for the current request, fold it into the aggregates and return it"""
+    stats = getattr(_request_stats, 'stats', None)
+    _request_stats.stats = None
+    if stats is None:
+        return None
+    
+    if endpoint:
+        with _metrics_lock:
+            agg = _metrics['endpoints'].setdefault(endpoint, {
+                'requests': 0, 'statements': 0, 'total_time': 0.0, 'max_statements': 0
+            })
+            agg['requests'] += 1
+            agg['statements'] += stats['statements']
+            agg['total_time'] += stats['total_time']
+            agg['max_statements'] = max(agg['max_statements'], stats['statements'])
+    return stats
+
+def get_db_metrics() -> dict:
+    """Return aggregated statement metrics since process start"""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+        metrics['endpoints'] = {name: dict(agg) for name, agg in _metrics['endpoints'].items()}
+    return metrics
+
+def timed_execute(cursor, query, args=()):
+    """Execute a statement on a cursor and record its timing"""
+    start = time.perf_counter()
+    cursor.execute(query, args)
+    _record_statement(cursor.connection, query, args, time.perf_counter() - start)
+    return cursor
+
+def _record_statement(db, query, args, elapsed):
+    """Add one statement to the request and process statistics"""
+    stats = getattr(_request_stats, 'stats', None)
+    if stats is not None:
+        stats['statements'] += 1
+        stats['total_time'] += elapsed
+        if elapsed >= stats['slowest_time']:
+            stats['slowest_time'] = elapsed
+            stats['slowest_statement'] = query
+    
+    is_slow = elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS
+    with _metrics_lock:
+        _metrics['statements'] += 1
+        _metrics['total_time'] += elapsed
+        if is_slow:
+            _metrics['slow_statements'] += 1
+        if elapsed >= _metrics['slowest_time']:
+            _metrics['slowest_time'] = elapsed
+            _metrics['slowest_statement'] = query
+    
+    if is_slow:
+        _log_slow_query(db, query, args, elapsed)
+
+def _log_slow_query(db, query, args, elapsed):
+    """Write a slow statement and its query plan to the slow-query log"""
+    if not slow_query_logger.handlers:
+        os.makedirs(os.path.dirname(SLOW_QUERY_LOG), exist_ok=True)
+        handler = logging.FileHandler(SLOW_QUERY_LOG)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+        slow_query_logger.propagate = False
+    
+    try:
+        plan = db.execute(f'EXPLAIN QUERY PLAN {query}', args).fetchall()
+        plan_text = '\n'.join(f'    {row[3]}' for row in plan)
+    except sqlite3.Error as e:
+        plan_text = f'    (no plan: {e})'
+    
+    statement = ' '.join(query.split())
+    slow_query_logger.info(f'{elapsed * 1000:.1f}ms {statement}\n{plan_text}')
+
 def query_db(query, args=(), one=False):
     """Query the database"""
     db = get_db()
     cursor = db.cursor()
+    start = time.perf_counter()
     cursor.execute(query, args)
     rv = cursor.fetchall()
+    _record_statement(db, query, args, time.perf_counter() - start)
     db.close()
     return (rv[0] if rv else None) if one else rv
 
+def iter_query(query, args=(), order_by=('id',), key=None, page_size=None):
+    """Query the database lazily, one keyset page per statement.
+
+    `query` is a SELECT without ORDER BY or LIMIT. Rows are read ordered by
+    the `order_by` expressions, which together must identify a row, and
+    each page resumes after the previous page's last row; `key(row)` returns
+    that row's values for `order_by` (by default the columns of the same
+    name). No cursor is held open while the caller works on the rows: in
+    rollback-journal mode an open SELECT keeps a SHARED lock, and writers
+    on other connections would fail with 'database is locked'.
+    """
+    page_size = page_size or STREAM_ARRAYSIZE
+    key = key or (lambda row: tuple(row[column] for column in order_by))
+    order = ', '.join(order_by)
+    joiner = ' AND ' if re.search(r'\bWHERE\b', query, re.IGNORECASE) else ' WHERE '
+    next_query = f"{query}{joiner}({order}) > ({', '.join('?' * len(order_by))}) ORDER BY {order} LIMIT ?"
+    
+    rows = query_db(f'{query} ORDER BY {order} LIMIT ?', (*args, page_size))
+    while rows:
+        yield from rows
+        if len(rows) < page_size:
+            return
+        rows = query_db(next_query, (*args, *key(rows[-1]), page_size))
+
 def execute_db(query, args=()):
     """Execute a database command"""
     db = get_db()
     cursor = db.cursor()
-    cursor.execute(query, args)
+    timed_execute(cursor, query, args)
+    db.commit()
+    db.close()
+
+def execute_many_db(query, rows):
+    """Execute a database command once per parameter tuple in a single transaction"""
+    rows = list(rows)
+    if not rows:
+        return
+    db = get_db()
+    cursor = db.cursor()
+    start = time.perf_counter()
+    cursor.executemany(query, rows)
+    _record_statement(db, query, rows[0], time.perf_counter() - start)
     db.commit()
     db.close()
@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.models.database import get_db, query_db, iter_query, timed_execute
+
+
+def parse_scene_row(row) -> dict:
+    """Convert a scenes row into a scene dict with JSON fields decoded"""
+    scene = dict(zip(row.keys(), row))
+
+    try:
+        scene['characters'] = json.loads(scene['characters']) if scene.get('characters') else []
+    except (TypeError, ValueError):
+        scene['characters'] = []
+
+    try:
+        scene['transitions'] = json.loads(scene['transitions']) if scene.get('transitions') else []
+    except (TypeError, ValueError):
+        scene['transitions'] = []
+
+    return scene
+
+
+class SceneCache:
+    """Bounded read-through cache of parsed scenes and per-project scene lists.
+
+    Writers call `invalidate()` after changing scene rows. Every invalidation
+    bumps the 'scenes' counter in the cache_versions table; other worker
+    processes check that counter at most once per SCENE_CACHE_SYNC_MS and
+    drop their copies when it moved, so a hit normally never touches the
+    database. Cached scene dicts are shared between callers and must be
+    treated as read-only.
+    """
+
+    MAX_SCENES = int(os.getenv('SCENE_CACHE_SIZE', 1024))
+    MAX_PROJECTS = int(os.getenv('SCENE_CACHE_PROJECTS', 128))
+    MAX_PROJECT_SCENES = int(os.getenv('SCENE_CACHE_MAX_PROJECT_SCENES', 256))
+
+    # Seconds between checks for invalidations made by other processes
+    SYNC_INTERVAL = float(os.getenv('SCENE_CACHE_SYNC_MS', 250)) / 1000
+
+    _lock = threading.RLock()
+    _scenes = OrderedDict()
+    _projects = OrderedDict()
+    _version = None
+    _synced_at = None
+    _generation = 0
+    _hits = 0
+    _misses = 0
+    _invalidations = 0
+
+    @staticmethod
+    def get_scene(scene_id: str) -> dict:
+        """Return a parsed scene by id, or None if it does not exist"""
+        generation = SceneCache._sync_version()
+
+        with SceneCache._lock:
+            scene = SceneCache._scenes.get(scene_id)
+            if scene is not None:
+                SceneCache._scenes.move_to_end(scene_id)
+                SceneCache._hits += 1
+                return scene
+            SceneCache._misses += 1
+
+        row = query_db('SELECT * FROM scenes WHERE id = ?', (scene_id,), one=True)
+        if not row:
+            return None
+
+        scene = parse_scene_row(row)
+        with SceneCache._lock:
+            if generation == SceneCache._generation:
+                SceneCache._store_scene(scene)
+        return scene
+
+    @staticmethod
+    def get_project_scenes(project_id: str) -> list:
+        """Return the parsed scenes of a project ordered by sequence"""
+        return list(SceneCache.iter_project_scenes(project_id))
+
+    @staticmethod
+    def iter_project_scenes(project_id: str):
+        """Yield the parsed scenes of a project ordered by sequence.
+
+        On a miss the rows are read in keyset pages on (sequence, id), each
+        with its own short statement, so no read lock is held while the
+        caller works between scenes. Projects with more than
+        MAX_PROJECT_SCENES scenes are never cached, so iterating a large
+        project keeps memory flat.
+        """
+        generation = SceneCache._sync_version()
+
+        with SceneCache._lock:
+            scenes = SceneCache._projects.get(project_id)
+            if scenes is not None:
+                SceneCache._projects.move_to_end(project_id)
+                SceneCache._hits += 1
+            else:
+                SceneCache._misses += 1
+
+        if scenes is not None:
+            yield from scenes
+            return
+
+        collected = []
+        rows = iter_query(
+            'SELECT * FROM scenes WHERE project_id = ?', (project_id,),
+            order_by=('IFNULL(sequence, 0)', 'id'),
+            key=lambda row: (row['sequence'] or 0, row['id'])
+        )
+        for row in rows:
+            scene = parse_scene_row(row)
+            if collected is not None:
+                collected.append(scene)
+                if len(collected) > SceneCache.MAX_PROJECT_SCENES:
+                    collected = None
+            yield scene
+
+        if collected is None:
+            return
+        with SceneCache._lock:
+            if generation == SceneCache._generation:
+                for scene in collected:
+                    SceneCache._store_scene(scene)
+                SceneCache._projects[project_id] = tuple(collected)
+                while len(SceneCache._projects) > SceneCache.MAX_PROJECTS:
+                    SceneCache._projects.popitem(last=False)
+
+    @staticmethod
+    def invalidate(scene_id: str = None, project_id: str = None):
+        """Drop cached data for a scene and/or project after a write"""
+        db = get_db()
+        try:
+            cursor = db.cursor()
+            timed_execute(cursor, "UPDATE cache_versions SET version = version + 1 WHERE name = 'scenes'")
+            row = timed_execute(cursor, "SELECT version FROM cache_versions WHERE name = 'scenes'").fetchone()
+            db.commit()
+        finally:
+            db.close()
+        version = row[0] if row else None
+
+        with SceneCache._lock:
+            SceneCache._generation += 1
+            SceneCache._invalidations += 1
+
+            if scene_id is not None:
+                scene = SceneCache._scenes.pop(scene_id, None)
+                if scene is not None and project_id is None:
+                    project_id = scene.get('project_id')
+            if project_id is not None:
+                for scene in SceneCache._projects.pop(project_id, ()):
+                    SceneCache._scenes.pop(scene['id'], None)
+
+            # Any bump we did not make ourselves means another process wrote
+            if SceneCache._version is None or version != SceneCache._version + 1:
+                SceneCache._clear()
+            SceneCache._version = version
+
+    @staticmethod
+    def clear():
+        """Drop every cached entry in this process"""
+        with SceneCache._lock:
+            SceneCache._generation += 1
+            SceneCache._clear()
+
+    @staticmethod
+    def stats() -> dict:
+        """Return hit rate and size metrics"""
+        with SceneCache._lock:
+            lookups = SceneCache._hits + SceneCache._misses
+            return {
+                'hits': SceneCache._hits,
+                'misses': SceneCache._misses,
+                'hit_rate': SceneCache._hits / lookups if lookups else 0.0,
+                'invalidations': SceneCache._invalidations,
+                'scenes': len(SceneCache._scenes),
+                'projects': len(SceneCache._projects),
+                'max_scenes': SceneCache.MAX_SCENES,
+                'max_projects': SceneCache.MAX_PROJECTS,
+                'version': SceneCache._version
+            }
+
+    @staticmethod
+    def _sync_version() -> int:
+        """Clear local entries if another process bumped the version; return the generation"""
+        now = time.monotonic()
+        with SceneCache._lock:
+            if SceneCache._synced_at is not None and now - SceneCache._synced_at < SceneCache.SYNC_INTERVAL:
+                return SceneCache._generation
+
+        row = query_db("SELECT version FROM cache_versions WHERE name = 'scenes'", one=True)
+        version = row[0] if row else None
+
+        with SceneCache._lock:
+            SceneCache._synced_at = now
+            if version != SceneCache._version:
+                if SceneCache._version is not None:
+                    SceneCache._generation += 1
+                    SceneCache._clear()
+                SceneCache._version = version
+            return SceneCache._generation
+
+    @staticmethod
+    def _store_scene(scene: dict):
+        SceneCache._scenes[scene['id']] = scene
+        SceneCache._scenes.move_to_end(scene['id'])
+        while len(SceneCache._scenes) > SceneCache.MAX_SCENES:
+            SceneCache._scenes.popitem(last=False)
+
+    @staticmethod
+    def _clear():
+        SceneCache._scenes.clear()
+        SceneCache._projects.clear()
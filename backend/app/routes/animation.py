@@ -3,42 +3,39 @@ import uuid
 from datetime import datetime
 import json
 import os
+import itertools
 from app.models.database import query_db, execute_db
+from app.models.scene_cache import SceneCache
 from app.services.animation_engine import AnimationEngine
 from app.services.story_generator import StoryGenerator
 from app.services.video_export import VideoExportService
+from app.services.audio_service import AudioService
+from app.services.audio_variants import AudioVariants
+from app.services.single_flight import SingleFlight
+from app.services.metrics import Metrics
+from app.services.admission import admission
 
 animation_bp = Blueprint('animation', __name__, url_prefix='/api/animations')
 
+_audio_flights = SingleFlight()
+
 @animation_bp.route('/preview/<scene_id>', methods=['GET'])
 def preview_scene(scene_id):
     """Preview a scene as SVG"""
-    result = query_db(
-        'SELECT * FROM scenes WHERE id = ?',
-        (scene_id,),
-        one=True
-    )
+    scene_data = SceneCache.get_scene(scene_id)
     
-    if not result:
+    if not scene_data:
         return jsonify({'error': 'Scene not found'}), 404
     
-    scene_id_db, project_id, story_id, sequence, title, background_type, characters, narration, duration, transitions, created_at = result
-    
-    # Parse characters data
-    try:
-        characters_data = json.loads(characters) if characters else []
-    except:
-        characters_data = []
-    
     # Get character definitions
     char_defs = StoryGenerator.get_available_characters()
     char_map = {k: v for k, v in char_defs.items()}
     
     # Render frame
     scene = {
-        'background_type': background_type or 'forest',
-        'characters': characters_data,
-        'narration': narration or ''
+        'background_type': scene_data['background_type'] or 'forest',
+        'characters': scene_data['characters'],
+        'narration': scene_data['narration'] or ''
     }
     
     svg = AnimationEngine.render_scene_frame(scene, char_map, 0)
@@ -48,47 +45,49 @@ def preview_scene(scene_id):
 @animation_bp.route('/audio/<scene_id>', methods=['GET'])
 def get_scene_audio(scene_id):
     """Get audio file URL for a scene"""
-    from app.services.audio_service import AudioService
-    import os
-    
-    result = query_db(
-        'SELECT id, narration, duration FROM scenes WHERE id = ?',
-        (scene_id,),
-        one=True
-    )
+    scene_data = SceneCache.get_scene(scene_id)
     
-    if not result:
+    if not scene_data:
         return jsonify({'error': 'Scene not found'}), 404
     
-    scene_id_db, narration, duration = result
+    narration = scene_data['narration']
     
     if not narration:
         return jsonify({'error': 'No narration for this scene'}), 404
     
     # Generate audio file if it doesn't exist
     audio_filename = f"{scene_id}.wav"
-    audio_filepath = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'storage', 'audio', audio_filename)
+    audio_filepath = os.path.join(AudioService.STORAGE_DIR, audio_filename)
     
     if not os.path.exists(audio_filepath):
+        def _generate():
+            # A concurrent request may have produced the file while we waited
+            if os.path.exists(audio_filepath):
+                return {'success': True}
+            return AudioService.generate_narration(narration, audio_filename)
+        
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(audio_filepath), exist_ok=True)
-            # Generate narration audio
-            result = AudioService.generate_narration(narration, audio_filename)
+            # Concurrent misses for the same scene wait for one synthesis
+            result = _audio_flights.do(audio_filepath, _generate)
             if not result.get('success'):
                 return jsonify({'error': 'Failed to generate audio'}), 500
         except Exception as e:
             print(f"Error generating audio: {e}")
             return jsonify({'error': str(e)}), 500
     
-    # Return the audio file
+    # Return the audio file, compressed when the client accepts it
     try:
-        return send_file(
-            audio_filepath,
-            mimetype='audio/wav',
+        path, mimetype, etag = AudioVariants.choose(audio_filepath, request)
+        response = send_file(
+            path,
+            mimetype=mimetype,
             as_attachment=False,
-            download_name=audio_filename
+            download_name=f"{scene_id}{os.path.splitext(path)[1]}",
+            conditional=True,
+            etag=etag or True
         )
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         print(f"Error sending audio file: {e}")
         return jsonify({'error': 'Failed to send audio file'}), 500
@@ -101,24 +100,36 @@ def update_scene(scene_id):
     data = request.json
     
     # Get current scene
-    result = query_db(
-        'SELECT * FROM scenes WHERE id = ?',
-        (scene_id,),
-        one=True
-    )
+    scene_data = SceneCache.get_scene(scene_id)
     
-    if not result:
+    if not scene_data:
         return jsonify({'error': 'Scene not found'}), 404
     
-    characters = json.dumps(data.get('characters', []))
-    background_type = data.get('background_type', result[5])
-    narration = data.get('narration', result[8])
+    characters = json.dumps(data.get('characters', scene_data['characters']))
+    background_type = data.get('background_type', scene_data['background_type'])
+    narration = data.get('narration', scene_data['narration'])
+    
+    # Re-plan the scene length when its narration changes
+    duration = scene_data['duration']
+    narration_changed = narration != scene_data['narration']
+    if narration_changed:
+        duration = AudioService.estimate_scene_duration(narration)
     
     execute_db(
-        '''UPDATE scenes SET characters = ?, background_type = ?, narration = ?
+        '''UPDATE scenes SET characters = ?, background_type = ?, narration = ?, duration = ?
            WHERE id = ?''',
-        (characters, background_type, narration, scene_id)
+        (characters, background_type, narration, duration, scene_id)
     )
+    SceneCache.invalidate(scene_id, scene_data['project_id'])
+    
+    # Lip-sync and the export soundtrack read the scene's WAV; drop the old narration's audio
+    if narration_changed:
+        AudioService.remove_scene_audio(scene_id)
+        if narration:
+            try:
+                AudioService.generate_audio_async(narration, scene_id)
+            except Exception as e:
+                print(f"Error regenerating scene audio: {e}")
     
     return jsonify({'success': True, 'scene_id': scene_id}), 200
 
@@ -126,13 +137,9 @@ def update_scene(scene_id):
 def delete_scene(scene_id):
     """Delete a scene"""
     # Get scene first to verify it exists
-    result = query_db(
-        'SELECT * FROM scenes WHERE id = ?',
-        (scene_id,),
-        one=True
-    )
+    scene_data = SceneCache.get_scene(scene_id)
     
-    if not result:
+    if not scene_data:
         return jsonify({'error': 'Scene not found'}), 404
     
     # Delete audio tracks associated with this scene
@@ -146,10 +153,12 @@ def delete_scene(scene_id):
         'DELETE FROM scenes WHERE id = ?',
         (scene_id,)
     )
+    SceneCache.invalidate(scene_id, scene_data['project_id'])
     
     return jsonify({'success': True, 'message': 'Scene deleted'}), 200
 
 @animation_bp.route('/render', methods=['POST'])
+@admission('export')
 def render_animation():
     """Render full animation as frames"""
     data = request.json
@@ -158,48 +167,44 @@ def render_animation():
     if not project_id:
         return jsonify({'error': 'project_id required'}), 400
     
-    # Get all scenes for project
-    results = query_db(
-        'SELECT * FROM scenes WHERE project_id = ? ORDER BY sequence',
-        (project_id,)
-    )
+    # Stream scenes for project
+    scenes = SceneCache.iter_project_scenes(project_id)
+    first_scene = next(scenes, None)
     
-    if not results:
+    if first_scene is None:
         return jsonify({'error': 'No scenes found'}), 404
     
-    frames = []
+    total_frames = 0
+    preview = None
     char_defs = StoryGenerator.get_available_characters()
     
-    for scene_row in results:
-        scene_id, _, _, sequence, _, background_type, characters, narration, duration, transitions, created_at = scene_row
-        
-        try:
-            characters_data = json.loads(characters) if characters else []
-        except:
-            characters_data = []
-        
+    for scene_data in itertools.chain([first_scene], scenes):
         scene = {
-            'background_type': background_type or 'forest',
-            'characters': characters_data
+            'background_type': scene_data['background_type'] or 'forest',
+            'characters': scene_data['characters'],
+            'mouth_shapes': AudioService.get_lip_sync(scene_data['id'], AnimationEngine.FRAME_RATE)
         }
         
         # Generate frames for this scene
-        num_frames = int(float(duration or 3.0) * AnimationEngine.FRAME_RATE)
+        num_frames = int(float(scene_data['duration'] or 3.0) * AnimationEngine.FRAME_RATE)
         for frame_num in range(num_frames):
             svg = AnimationEngine.render_scene_frame(scene, char_defs, frame_num)
-            frames.append({
-                'scene_id': scene_id,
-                'frame_num': frame_num,
-                'svg': svg
-            })
+            if preview is None:
+                preview = {
+                    'scene_id': scene_data['id'],
+                    'frame_num': frame_num,
+                    'svg': svg
+                }
+            total_frames += 1
     
     return jsonify({
-        'total_frames': len(frames),
+        'total_frames': total_frames,
         'frame_rate': AnimationEngine.FRAME_RATE,
-        'preview': frames[0] if frames else None
+        'preview': preview
     }), 200
 
 @animation_bp.route('/export/<project_id>', methods=['POST'])
+@admission('export')
 def export_video(project_id):
     """Export animation as MP4 video"""
     data = request.json or {}
@@ -214,13 +219,11 @@ def export_video(project_id):
     if not project_result:
         return jsonify({'error': 'Project not found'}), 404
     
-    # Get all scenes
-    scenes = query_db(
-        'SELECT * FROM scenes WHERE project_id = ? ORDER BY sequence',
-        (project_id,)
-    )
+    # Stream scenes
+    scenes = SceneCache.iter_project_scenes(project_id)
+    first_scene = next(scenes, None)
     
-    if not scenes:
+    if first_scene is None:
         return jsonify({'error': 'No scenes found'}), 404
     
     try:
@@ -229,40 +232,34 @@ def export_video(project_id):
         
         char_defs = StoryGenerator.get_available_characters()
         frame_count = 0
+        soundtrack_segments = []
         
         # Render all frames
-        for scene_row in scenes:
-            scene_id, _, _, sequence, background_type, characters, narration, duration, transitions, created_at = scene_row
-            
-            try:
-                characters_data = json.loads(characters) if characters else []
-            except:
-                characters_data = []
+        with Metrics.stage_timer('render'):
+            for scene_data in itertools.chain([first_scene], scenes):
+                scene = {
+                    'background_type': scene_data['background_type'] or 'forest',
+                    'characters': scene_data['characters'],
+                    'mouth_shapes': AudioService.get_lip_sync(scene_data['id'], AnimationEngine.FRAME_RATE)
+                }
             
-            scene = {
-                'background_type': background_type or 'forest',
-                'characters': characters_data
-            }
-            
-            # Generate frames for this scene
-            num_frames = int(float(duration or 3.0) * AnimationEngine.FRAME_RATE)
-            for frame_num in range(num_frames):
-                svg = AnimationEngine.render_scene_frame(scene, char_defs, frame_num)
-                
-                # Save as PNG (requires ImageMagick)
-                png_path = os.path.join(frame_dir, f'frame_{frame_count:06d}.png')
-                # VideoExportService.save_frame_as_png(svg, png_path)
-                
-                # For now, just count frames
-                frame_count += 1
+                # Generate frames for this scene
+                num_frames = int(float(scene_data['duration'] or 3.0) * AnimationEngine.FRAME_RATE)
+                soundtrack_segments.append((
+                    AudioService.scene_audio_path(scene_data['id']),
+                    num_frames / AnimationEngine.FRAME_RATE
+                ))
+                frame_count += VideoExportService.render_scene_frames(
+                    scene, char_defs, frame_dir, frame_count, 0, num_frames
+                )
         
-        # Get audio track if exists
-        audio_result = query_db(
-            'SELECT file_path FROM audio_tracks WHERE project_id = ? LIMIT 1',
-            (project_id,),
-            one=True
-        )
-        audio_path = audio_result[0] if audio_result else None
+        # Assemble the scene narrations into one soundtrack aligned to the frames
+        audio_path = None
+        if any(path for path, _ in soundtrack_segments):
+            from app.services.soundtrack import SoundtrackBuilder
+            audio_path = os.path.join(frame_dir, 'soundtrack.wav')
+            with Metrics.stage_timer('mux'):
+                SoundtrackBuilder.build(soundtrack_segments, audio_path)
         
         # Create video
         output_path = f'storage/videos/{project_id}.mp4'
@@ -292,3 +289,8 @@ def export_video(project_id):
             'error': str(e),
             'message': 'Error exporting video'
         }), 500
+
+@animation_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get scene cache hit rate and size metrics"""
+    return jsonify(SceneCache.stats()), 200
@@ -0,0 +1,90 @@
+import json
+import os
+from app.asgi import AsyncRouter, AsyncResponse, json_response
+from app.models.async_db import AsyncDB
+from app.models.scene_cache import SceneCache
+from app.services.admission import AdmissionRejected
+from app.services.animation_engine import AnimationEngine
+from app.services.export_jobs import ExportJobs
+from app.services.story_generator import StoryGenerator
+
+# Routes served natively by the async server (asgi.py); all others go to Flask
+router = AsyncRouter()
+
+# Seconds between keep-alive comments on an idle progress stream
+KEEPALIVE_INTERVAL = float(os.getenv('SSE_KEEPALIVE', 15))
+
+@router.route('/api/animations/preview/<scene_id>')
+async def preview_scene(request, scene_id):
+    """Preview a scene as SVG"""
+    scene_data = await AsyncDB.run(SceneCache.get_scene, scene_id)
+
+    if not scene_data:
+        return json_response({'error': 'Scene not found'}, 404)
+
+    scene = {
+        'background_type': scene_data['background_type'] or 'forest',
+        'characters': scene_data['characters'],
+        'narration': scene_data['narration'] or ''
+    }
+
+    # One frame from cached sprites is cheap enough to render on the event loop
+    svg = AnimationEngine.render_scene_frame(scene, StoryGenerator.get_available_characters(), 0)
+
+    return AsyncResponse(svg, mimetype='image/svg+xml')
+
+@router.route('/api/animations/export/<project_id>/jobs', methods=['POST'])
+async def start_export(request, project_id):
+    """Start exporting a project's video in the background, or return the export in progress"""
+    project = await AsyncDB.query('SELECT id FROM projects WHERE id = ?', (project_id,), one=True)
+
+    if not project:
+        return json_response({'error': 'Project not found'}, 404)
+
+    try:
+        job, created = await ExportJobs.start(project_id)
+    except AdmissionRejected as e:
+        return AsyncResponse(json.dumps({'error': 'Server busy, please retry', 'class': e.class_name,
+                                         'retry_after': e.retry_after}),
+                             429, headers={'Retry-After': e.retry_after})
+
+    # An export already running for the project is returned instead of starting another
+    return json_response(job.to_dict(), 202 if created else 200)
+
+@router.route('/api/animations/export/jobs/<job_id>')
+async def get_export_job(request, job_id):
+    """Get the progress of an export"""
+    job = ExportJobs.get(job_id)
+
+    if not job:
+        return json_response({'error': 'Export job not found'}, 404)
+
+    return json_response(job.to_dict())
+
+@router.route('/api/animations/export/jobs/<job_id>/events')
+async def export_job_events(request, job_id):
+    """Stream an export's progress as Server-Sent Events: progress, then done"""
+    job = ExportJobs.get(job_id)
+
+    if not job:
+        return json_response({'error': 'Export job not found'}, 404)
+
+    async def generate():
+        version = job.version
+        yield _sse('progress', job.to_dict())
+        while not job.finished:
+            if await job.wait_for_change(version, KEEPALIVE_INTERVAL):
+                version = job.version
+                yield _sse('progress', job.to_dict())
+            else:
+                yield ': keep-alive\n\n'
+        yield _sse('done', job.to_dict())
+
+    return AsyncResponse(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def _sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
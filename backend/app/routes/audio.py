@@ -3,11 +3,14 @@ import uuid
 from datetime import datetime
 from app.models.database import execute_db
 from app.services.audio_service import AudioService
+from app.services.audio_variants import AudioVariants
+from app.services.admission import admission
 import os
 
 audio_bp = Blueprint('audio', __name__, url_prefix='/api/audio')
 
 @audio_bp.route('/generate', methods=['POST'])
+@admission('generate')
 def generate_audio():
     """Generate audio from text using TTS"""
     data = request.json
@@ -51,6 +54,12 @@ def estimate_duration():
     
     return jsonify({'text': text, 'estimated_duration': duration}), 200
 
+@audio_bp.route('/duration-model', methods=['GET'])
+def get_duration_model():
+    """Get the fitted narration duration model"""
+    from app.services.duration_model import DurationModel
+    return jsonify(DurationModel.stats()), 200
+
 @audio_bp.route('/mouth-animation/<duration>', methods=['GET'])
 def get_mouth_animation(duration):
     """Get mouth animation keyframes for given audio duration"""
@@ -59,24 +68,31 @@ def get_mouth_animation(duration):
     except:
         return jsonify({'error': 'Invalid duration'}), 400
     
-    keyframes = AudioService.generate_mouth_animation_frames(dur)
+    filename = request.args.get('filename')
+    if filename and ('..' in filename or '/' in filename or '\\' in filename):
+        return jsonify({'error': 'Invalid filename'}), 400
+    
+    keyframes = AudioService.generate_mouth_animation_frames(dur, filename=filename)
     
     return jsonify({'keyframes': keyframes}), 200
 
 @audio_bp.route('/<filename>', methods=['GET'])
 def serve_audio(filename):
-    """Serve audio file"""
+    """Serve audio file, compressed when the client accepts it, with Range support"""
     try:
         # Security: ensure filename doesn't contain path traversal
         if '..' in filename or '/' in filename or '\\' in filename:
             return jsonify({'error': 'Invalid filename'}), 400
         
-        # Use os.path.join for proper path handling on all platforms
-        filepath = os.path.join(os.getcwd(), 'storage', 'audio', filename)
+        filepath = os.path.join(AudioService.STORAGE_DIR, filename)
         
         if not os.path.exists(filepath):
             return jsonify({'error': f'Audio file not found: {filename}'}), 404
         
-        return send_file(filepath, mimetype='audio/wav', as_attachment=False)
+        path, mimetype, etag = AudioVariants.choose(filepath, request)
+        
+        response = send_file(path, mimetype=mimetype, as_attachment=False, conditional=True, etag=etag or True)
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
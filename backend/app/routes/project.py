@@ -2,7 +2,13 @@ from flask import Blueprint, request, jsonify
 import uuid
 from datetime import datetime
 import json
+import base64
+import html
+import re
+from urllib.parse import urlencode
+from app.models import database
 from app.models.database import query_db, execute_db
+from app.models.scene_cache import SceneCache
 from app.services.story_generator import StoryGenerator
 
 project_bp = Blueprint('project', __name__, url_prefix='/api/projects')
@@ -51,10 +57,7 @@ def get_project(project_id):
     )
     
     # Get associated scenes
-    scenes = query_db(
-        'SELECT id, sequence, background_type, title, narration FROM scenes WHERE project_id = ? ORDER BY sequence',
-        (project_id,)
-    )
+    scenes = SceneCache.get_project_scenes(project_id)
     
     return jsonify({
         'id': proj_id,
@@ -64,28 +67,164 @@ def get_project(project_id):
         'updated_at': updated_at,
         'status': status,
         'stories': [{'id': s[0], 'title': s[1]} for s in stories],
-        'scenes': [{'id': s[0], 'sequence': s[1], 'background': s[2], 'title': s[3], 'narration': s[4]} for s in scenes]
+        'scenes': [{'id': s['id'], 'sequence': s['sequence'], 'background': s['background_type'], 'title': s['title'], 'narration': s['narration']} for s in scenes]
     }), 200
 
+PROJECT_FIELDS = ('id', 'name', 'description', 'created_at', 'updated_at', 'thumbnail', 'status')
+PROJECT_LIST_DEFAULT_FIELDS = ('id', 'name', 'description', 'created_at', 'updated_at', 'status')
+PROJECT_LIST_DEFAULT_LIMIT = 50
+PROJECT_LIST_MAX_LIMIT = 200
+
+def _encode_cursor(updated_at, project_id):
+    """Encode a (updated_at, id) keyset position as an opaque cursor"""
+    raw = json.dumps([updated_at, project_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor, raising ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        updated_at, project_id = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(updated_at, str) or not isinstance(project_id, str):
+        raise ValueError('Invalid cursor')
+    return updated_at, project_id
+
 @project_bp.route('', methods=['GET'])
 def list_projects():
-    """List all projects"""
+    """List projects, newest first, one page at a time.
+
+    Query parameters: limit, cursor (from the X-Next-Cursor header of the
+    previous page), status, and fields (comma-separated column names).
+    """
+    try:
+        limit = int(request.args.get('limit', PROJECT_LIST_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    limit = max(1, min(limit, PROJECT_LIST_MAX_LIMIT))
+    
+    fields = PROJECT_LIST_DEFAULT_FIELDS
+    if request.args.get('fields'):
+        fields = tuple(f.strip() for f in request.args['fields'].split(',') if f.strip())
+        unknown = [f for f in fields if f not in PROJECT_FIELDS]
+        if unknown or not fields:
+            return jsonify({'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+    
+    # The keyset columns are always selected so the next cursor can be built
+    columns = list(dict.fromkeys(fields + ('updated_at', 'id')))
+    conditions = []
+    args = []
+    
+    status = request.args.get('status')
+    if status:
+        conditions.append('status = ?')
+        args.append(status)
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            args.extend(_decode_cursor(cursor))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        conditions.append('(updated_at, id) < (?, ?)')
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
     results = query_db(
-        'SELECT id, name, description, created_at, updated_at, status FROM projects ORDER BY updated_at DESC'
+        f'SELECT {", ".join(columns)} FROM projects {where} ORDER BY updated_at DESC, id DESC LIMIT ?',
+        (*args, limit + 1)
     )
     
-    projects = []
-    for row in results:
-        projects.append({
-            'id': row[0],
-            'name': row[1],
-            'description': row[2],
-            'created_at': row[3],
-            'updated_at': row[4],
-            'status': row[5]
-        })
-    
-    return jsonify(projects), 200
+    has_more = len(results) > limit
+    results = results[:limit]
+    
+    projects = [{field: row[field] for field in fields} for row in results]
+    
+    headers = {}
+    if has_more:
+        last = results[-1]
+        next_cursor = _encode_cursor(last['updated_at'], last['id'])
+        headers['X-Next-Cursor'] = next_cursor
+        next_args = request.args.to_dict()
+        next_args['cursor'] = next_cursor
+        headers['Link'] = f'<{request.base_url}?{urlencode(next_args)}>; rel="next"'
+    
+    return jsonify(projects), 200, headers
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Private-use characters marking matches, swapped for <mark> tags after escaping
+SNIPPET_OPEN = '\ue000'
+SNIPPET_CLOSE = '\ue001'
+
+def _build_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def _highlight(snippet):
+    """HTML-escape a search snippet, then turn its match markers into <mark> tags"""
+    if snippet is None:
+        return None
+    return (html.escape(snippet)
+            .replace(SNIPPET_OPEN, '<mark>')
+            .replace(SNIPPET_CLOSE, '</mark>'))
+
+@project_bp.route('/search', methods=['GET'])
+def search_projects():
+    """Full-text search over story titles and prompts and scene titles and narration"""
+    if not database.FTS_ENABLED:
+        return jsonify({'error': 'Full-text search is not available'}), 503
+    
+    match = _build_match_query(request.args.get('q', ''))
+    if not match:
+        return jsonify({'error': 'q required'}), 400
+    
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or offset'}), 400
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+    
+    results = query_db(
+        '''SELECT hits.*, projects.name AS project_name
+           FROM (
+               SELECT project_id, source_type, source_id, title, rank,
+                      snippet(search_index, 1, ?, ?, '…', 16) AS snippet
+               FROM search_index
+               WHERE search_index MATCH ?
+               ORDER BY rank
+               LIMIT ? OFFSET ?
+           ) AS hits
+           LEFT JOIN projects ON projects.id = hits.project_id
+           ORDER BY hits.rank''',
+        (SNIPPET_OPEN, SNIPPET_CLOSE, match, limit + 1, offset)
+    )
+    
+    has_more = len(results) > limit
+    hits = [{
+        'project_id': row['project_id'],
+        'project_name': row['project_name'],
+        'type': row['source_type'],
+        'id': row['source_id'],
+        'title': row['title'],
+        'snippet': _highlight(row['snippet']),
+        'score': -row['rank']
+    } for row in results[:limit]]
+    
+    return jsonify({
+        'query': request.args.get('q'),
+        'results': hits,
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if has_more else None
+    }), 200
 
 @project_bp.route('/<project_id>/update', methods=['PUT'])
 def update_project(project_id):
@@ -108,6 +247,7 @@ def delete_project(project_id):
     execute_db('DELETE FROM scenes WHERE project_id = ?', (project_id,))
     execute_db('DELETE FROM stories WHERE project_id = ?', (project_id,))
     execute_db('DELETE FROM projects WHERE id = ?', (project_id,))
+    SceneCache.invalidate(project_id=project_id)
     
     return jsonify({'success': True}), 200
 
@@ -133,6 +273,7 @@ def create_scene(project_id):
          json.dumps(scene['characters']), scene['narration'], scene['duration'],
          scene['transitions'], datetime.now().isoformat())
     )
+    SceneCache.invalidate(scene_id, project_id)
     
     return jsonify({
         'scene_id': scene_id,
@@ -1,85 +1,217 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import queue
+import time
 import uuid
 import json
+import math
 from datetime import datetime
 from app.models.database import query_db, execute_db
+from app.models.scene_cache import SceneCache
 from app.services.story_generator import StoryGenerator
-from app.services.audio_service import AudioService
+from app.services.llm_client import get_llm_client
+from app.services.story_pipeline import StoryPipeline
+from app.services.admission import admission
 
 story_bp = Blueprint('story', __name__, url_prefix='/api/stories')
 
 @story_bp.route('/create', methods=['POST'])
+@admission('generate')
 def create_story():
     """Create a new story from a prompt or template"""
     data = request.json
     project_id = data.get('project_id')
     prompt = data.get('prompt', '')
     use_template = data.get('use_template', False)
+    bypass_cache = data.get('bypass_cache', False)
     
     if not project_id:
         return jsonify({'error': 'project_id required'}), 400
     
-    # Generate story structure
-    story_data = StoryGenerator.generate_from_prompt(prompt)
+    return jsonify(StoryPipeline.create(project_id, prompt, use_cache=not bypass_cache)), 201
+
+@story_bp.route('/batch', methods=['POST'])
+@admission('batch')
+def create_story_batch():
+    """Create stories for many (project_id, prompt) pairs, streaming NDJSON results
     
-    story_id = story_data['story_id']
-    title = story_data['title']
+    Items run concurrently on the batch worker pool; each result line is
+    written as soon as its story is done, followed by a summary line.
+    """
+    data = request.json or {}
+    items = data.get('items')
     
-    # Insert into database
-    execute_db(
-        '''INSERT INTO stories (id, project_id, title, description, content, created_at)
-           VALUES (?, ?, ?, ?, ?, ?)''',
-        (story_id, project_id, title, prompt, str(story_data), datetime.now().isoformat())
-    )
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items required'}), 400
+    if len(items) > StoryPipeline.BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {StoryPipeline.BATCH_MAX_ITEMS} items per batch'}), 400
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('project_id'):
+            return jsonify({'error': f'items[{index}]: project_id required'}), 400
     
-    # Create scenes in database and auto-generate audio
-    scenes_response = []
-    for scene in story_data.get('scenes', []):
-        scene_id = str(uuid.uuid4())
-        characters_data = json.dumps(scene.get('characters', []))
-        animations_data = json.dumps(scene.get('animations', []))
-        narration = scene.get('narration', '')
-        audio_filename = None
-        
-        execute_db(
-            '''INSERT INTO scenes (id, project_id, story_id, sequence, title, background_type, characters, narration, duration, transitions, created_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (scene_id, project_id, story_id, scene.get('sequence', 1), scene.get('title', ''), 
-             scene.get('background', 'forest'), characters_data, narration, scene.get('duration', 3),
-             animations_data, datetime.now().isoformat())
-        )
+    use_cache = not data.get('bypass_cache', False)
+    audio_timeout = data.get('audio_timeout')
+    if audio_timeout is not None and (isinstance(audio_timeout, bool) or not isinstance(audio_timeout, (int, float))
+                                      or not math.isfinite(audio_timeout) or audio_timeout < 0):
+        return jsonify({'error': 'audio_timeout must be a non-negative number of seconds'}), 400
+    
+    def generate():
+        started_at = time.perf_counter()
+        succeeded = failed = 0
+        for result in StoryPipeline.run_batch(items, use_cache=use_cache, audio_timeout=audio_timeout):
+            if result['status'] == 'ok':
+                succeeded += 1
+            else:
+                failed += 1
+            yield json.dumps(result) + '\n'
+        yield json.dumps({'summary': {
+            'total': len(items),
+            'succeeded': succeeded,
+            'failed': failed,
+            'seconds': round(time.perf_counter() - started_at, 3)
+        }}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@story_bp.route('/pipeline/stats', methods=['GET'])
+def get_pipeline_stats():
+    """Get per-stage concurrency statistics for story creation"""
+    return jsonify(StoryPipeline.stats()), 200
+
+@story_bp.route('/create/stream', methods=['POST'])
+@admission('generate')
+def create_story_stream():
+    """Create a story and stream it to the client as Server-Sent Events
+    
+    Each scene is saved and its narration queued for synthesis as soon as
+    the LLM finishes writing it. Events: story, scene, audio, done.
+    """
+    data = request.json or {}
+    project_id = data.get('project_id')
+    prompt = data.get('prompt', '')
+    bypass_cache = data.get('bypass_cache', False)
+    
+    if not project_id:
+        return jsonify({'error': 'project_id required'}), 400
+    
+    def generate():
+        story_id = str(uuid.uuid4())
+        title = None
+        story_saved = False
+        saved_scenes = []
+        audio_jobs = {}
+        audio_done = queue.Queue()
+        info = {}
         
-        # Auto-generate audio for the scene
-        try:
-            if narration and narration.strip():
-                audio_filename = AudioService.generate_audio(narration, scene_id)
-                audio_duration = AudioService.get_audio_duration(audio_filename)
+        for kind, value in StoryGenerator.stream_from_prompt(prompt, use_cache=not bypass_cache):
+            if kind == 'title':
+                title = value
+            elif kind == 'scene':
+                if not story_saved:
+                    title = title or prompt[:50]
+                    with StoryPipeline.stage('db'):
+                        execute_db(StoryPipeline.STORY_INSERT,
+                                   (story_id, project_id, title, prompt, '', datetime.now().isoformat()))
+                    story_saved = True
+                    yield _sse('story', {'story_id': story_id, 'title': title})
+                
+                scene_id = str(uuid.uuid4())
+                StoryPipeline.plan_scene(value)
+                with StoryPipeline.stage('db'):
+                    execute_db(StoryPipeline.SCENE_INSERT, StoryPipeline.scene_row(scene_id, project_id, story_id, value))
+                SceneCache.invalidate(project_id=project_id)
+                saved_scenes.append((scene_id, value))
                 
-                # Save audio track to database
-                audio_id = str(uuid.uuid4())
-                execute_db(
-                    '''INSERT INTO audio_tracks (id, project_id, scene_id, track_type, content, duration, file_path, created_at)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                    (audio_id, project_id, scene_id, 'narration', narration, audio_duration, audio_filename, datetime.now().isoformat())
-                )
-        except Exception as e:
-            print(f"Error generating audio for scene {scene_id}: {e}")
+                narration = value.get('narration', '')
+                if narration and narration.strip():
+                    try:
+                        job = StoryPipeline.synthesize(narration, scene_id)
+                        audio_jobs[scene_id] = (job, narration)
+                        job.add_done_callback(lambda done, scene_id=scene_id: audio_done.put(scene_id))
+                    except Exception as e:
+                        print(f"Error generating audio for scene {scene_id}: {e}")
+                
+                yield _sse('scene', {
+                    'id': scene_id,
+                    'story_id': story_id,
+                    'sequence': value.get('sequence', len(saved_scenes)),
+                    'title': value.get('title', ''),
+                    'background': value.get('background', 'forest'),
+                    'characters': value.get('characters', []),
+                    'narration': narration,
+                    'duration': value['duration']
+                })
+            elif kind == 'done':
+                info = value
+            
+            # Report audio that finished while the LLM was still writing
+            while True:
+                try:
+                    scene_id = audio_done.get_nowait()
+                except queue.Empty:
+                    break
+                yield _audio_event(project_id, scene_id, audio_jobs.pop(scene_id))
+        
+        if story_saved:
+            with StoryPipeline.stage('db'):
+                execute_db('UPDATE stories SET title = ?, content = ? WHERE id = ?',
+                           (title, StoryPipeline.story_content(story_id, title, saved_scenes), story_id))
+        
+        # Wait a bounded time for the remaining narration
+        deadline = time.monotonic() + StoryPipeline.AUDIO_TIMEOUT
+        while audio_jobs:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                scene_id = audio_done.get(timeout=remaining)
+            except queue.Empty:
+                break
+            yield _audio_event(project_id, scene_id, audio_jobs.pop(scene_id))
         
-        scenes_response.append({
-            'id': scene_id,
-            'sequence': scene.get('sequence', 1),
-            'title': scene.get('title', ''),
-            'background': scene.get('background', 'forest'),
-            'narration': narration,
-            'audio_filename': audio_filename,
-            'audio_ready': True
-        })
+        for scene_id, (job, narration) in audio_jobs.items():
+            # Record the track whenever synthesis finishes
+            job.add_done_callback(
+                lambda done, scene_id=scene_id, narration=narration:
+                    StoryPipeline.record_late_audio(done, project_id, scene_id, narration)
+            )
+        
+        yield _sse('done', dict(info, story_id=story_id if story_saved else None, title=title,
+                                scene_count=len(saved_scenes), audio_pending=list(audio_jobs)))
     
-    return jsonify({
-        'story_id': story_id,
-        'title': title,
-        'scenes': scenes_response
-    }), 201
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def _sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _audio_event(project_id, scene_id, audio_job):
+    """Save a finished scene narration and describe it as an SSE audio event"""
+    job, narration = audio_job
+    try:
+        audio_filename = job.result()
+        with StoryPipeline.stage('db'):
+            execute_db(StoryPipeline.AUDIO_TRACK_INSERT,
+                       StoryPipeline.audio_track_row(project_id, scene_id, narration, audio_filename))
+    except Exception as e:
+        print(f"Error generating audio for scene {scene_id}: {e}")
+        return _sse('audio', {'scene_id': scene_id, 'audio_ready': False, 'error': str(e)})
+    return _sse('audio', {'scene_id': scene_id, 'audio_filename': audio_filename, 'audio_ready': True})
+
+@story_bp.route('/cache/stats', methods=['GET'])
+def get_story_cache_stats():
+    """Get LLM response cache statistics"""
+    return jsonify(StoryGenerator.get_cache().stats()), 200
+
+@story_bp.route('/llm/stats', methods=['GET'])
+def get_llm_stats():
+    """Get LLM call, retry and circuit breaker statistics"""
+    return jsonify(get_llm_client().stats()), 200
 
 @story_bp.route('/characters', methods=['GET'])
 def get_characters():
@@ -0,0 +1,181 @@
+import functools
+import math
+import os
+import threading
+import time
+from flask import jsonify, make_response
+
+
+ADMISSION_ENABLED = os.getenv('ADMISSION', '1') != '0'
+
+
+class AdmissionRejected(Exception):
+    """The request's class is at its limit and its wait queue is full (or the wait timed out)"""
+
+    def __init__(self, class_name: str, retry_after: int):
+        super().__init__(f'{class_name} requests are at capacity')
+        self.class_name = class_name
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'class_name', 'granted')
+
+    def __init__(self, priority: int, seq: int, class_name: str):
+        self.priority = priority
+        self.seq = seq
+        self.class_name = class_name
+        self.granted = threading.Event()
+
+
+class Admission:
+    """Admission control for the expensive endpoints.
+
+    Each class has its own concurrency limit and a bounded wait queue, and
+    all classes share HEAVY_SLOTS running slots. When a slot frees up it goes
+    to the waiting request with the best priority (lowest number), then the
+    longest waiting. Interactive routes (previews, editing) are never gated:
+    running plus queued heavy requests stay below the server's worker
+    threads, so there is always a thread free for them.
+    """
+
+    # Running heavy requests across all classes
+    HEAVY_SLOTS = int(os.getenv('ADMISSION_HEAVY_SLOTS', 4))
+
+    # Seconds a request may wait for a slot before it is turned away
+    MAX_WAIT = float(os.getenv('ADMISSION_MAX_WAIT', 10))
+
+    CLASSES = {
+        # Story creation and narration a user is waiting for
+        'generate': {'priority': 1, 'limit': int(os.getenv('ADMISSION_GENERATE_LIMIT', 3)),
+                     'queue': int(os.getenv('ADMISSION_GENERATE_QUEUE', 2)), 'expected_seconds': 5.0},
+        # Full renders and video exports
+        'export': {'priority': 2, 'limit': int(os.getenv('ADMISSION_EXPORT_LIMIT', 2)),
+                   'queue': int(os.getenv('ADMISSION_EXPORT_QUEUE', 1)), 'expected_seconds': 30.0},
+        # Bulk story generation
+        'batch': {'priority': 3, 'limit': int(os.getenv('ADMISSION_BATCH_LIMIT', 1)),
+                  'queue': int(os.getenv('ADMISSION_BATCH_QUEUE', 1)), 'expected_seconds': 60.0}
+    }
+
+    _lock = threading.Lock()
+    _waiters = []
+    _seq = 0
+    _heavy_running = 0
+    _stats = {name: {'running': 0, 'waiting': 0, 'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0,
+                     'service_seconds': spec['expected_seconds']}
+              for name, spec in CLASSES.items()}
+
+    @staticmethod
+    def acquire(class_name: str, timeout: float = None) -> float:
+        """Take a slot for class_name, waiting in priority order; return the time admitted"""
+        spec = Admission.CLASSES[class_name]
+        stats = Admission._stats[class_name]
+        with Admission._lock:
+            # Slots are handed to waiters as soon as they free up, so nobody
+            # queued could use capacity that is free now
+            if Admission._has_capacity(class_name):
+                Admission._grant(class_name)
+                return time.monotonic()
+            if stats['waiting'] >= spec['queue']:
+                stats['rejected'] += 1
+                raise AdmissionRejected(class_name, Admission._retry_after(class_name))
+
+            Admission._seq += 1
+            waiter = _Waiter(spec['priority'], Admission._seq, class_name)
+            Admission._waiters.append(waiter)
+            stats['waiting'] += 1
+            stats['queued'] += 1
+
+        if waiter.granted.wait(Admission.MAX_WAIT if timeout is None else timeout):
+            return time.monotonic()
+
+        with Admission._lock:
+            if waiter.granted.is_set():
+                # Granted just as the wait ran out
+                return time.monotonic()
+            Admission._waiters.remove(waiter)
+            stats['waiting'] -= 1
+            stats['timed_out'] += 1
+            raise AdmissionRejected(class_name, Admission._retry_after(class_name))
+
+    @staticmethod
+    def release(class_name: str, admitted_at: float):
+        """Give the slot back and hand free slots to the best waiting requests"""
+        with Admission._lock:
+            stats = Admission._stats[class_name]
+            stats['running'] -= 1
+            Admission._heavy_running -= 1
+            # Moving average of how long a request of this class holds its slot
+            stats['service_seconds'] = 0.8 * stats['service_seconds'] + 0.2 * (time.monotonic() - admitted_at)
+
+            for waiter in sorted(Admission._waiters, key=lambda w: (w.priority, w.seq)):
+                if Admission._heavy_running >= Admission.HEAVY_SLOTS:
+                    break
+                if Admission._has_capacity(waiter.class_name):
+                    Admission._waiters.remove(waiter)
+                    Admission._stats[waiter.class_name]['waiting'] -= 1
+                    Admission._grant(waiter.class_name)
+                    waiter.granted.set()
+
+    @staticmethod
+    def stats() -> dict:
+        with Admission._lock:
+            classes = {name: dict(stats, service_seconds=round(stats['service_seconds'], 3),
+                                  limit=Admission.CLASSES[name]['limit'], queue=Admission.CLASSES[name]['queue'],
+                                  priority=Admission.CLASSES[name]['priority'])
+                       for name, stats in Admission._stats.items()}
+            return {'enabled': ADMISSION_ENABLED, 'heavy_slots': Admission.HEAVY_SLOTS,
+                    'heavy_running': Admission._heavy_running, 'max_wait': Admission.MAX_WAIT, 'classes': classes}
+
+    @staticmethod
+    def _has_capacity(class_name: str) -> bool:
+        return (Admission._heavy_running < Admission.HEAVY_SLOTS
+                and Admission._stats[class_name]['running'] < Admission.CLASSES[class_name]['limit'])
+
+    @staticmethod
+    def _grant(class_name: str):
+        stats = Admission._stats[class_name]
+        stats['running'] += 1
+        stats['admitted'] += 1
+        Admission._heavy_running += 1
+
+    @staticmethod
+    def _retry_after(class_name: str) -> int:
+        """Seconds until a slot is likely free: queued work over the class limit"""
+        stats = Admission._stats[class_name]
+        limit = max(1, Admission.CLASSES[class_name]['limit'])
+        estimate = stats['service_seconds'] * (stats['waiting'] + 1) / limit
+        return max(1, min(120, math.ceil(estimate)))
+
+
+def admission(class_name: str):
+    """Gate a view behind the class's admission control.
+
+    The slot is held until the response is closed, so streamed bodies count
+    for as long as they are being sent. Rejected requests get 429 with a
+    Retry-After estimate.
+    """
+    def decorator(view):
+        if not ADMISSION_ENABLED:
+            return view
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                admitted_at = Admission.acquire(class_name)
+            except AdmissionRejected as e:
+                response = jsonify({'error': 'Server busy, please retry', 'class': e.class_name,
+                                    'retry_after': e.retry_after})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                Admission.release(class_name, admitted_at)
+                raise
+            response.call_on_close(lambda: Admission.release(class_name, admitted_at))
+            return response
+        return wrapper
+    return decorator
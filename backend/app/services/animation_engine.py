@@ -14,25 +14,54 @@ class MouthShapes:
         'teeth': 'M -10 -18 Q 0 -15 10 -18 M -8 -18 L -8 -16 M 0 -18 L 0 -16 M 8 -18 L 8 -16',  # Showing teeth
     }
     
+    # Viseme table: phoneme -> SHAPES key
+    PHONEME_MAP = {
+        'p': 'oh', 'b': 'oh', 'm': 'oh',  # Bilabial
+        'a': 'open', 'o': 'oh',  # Vowels
+        'e': 'narrow', 'i': 'narrow',  # Front vowels
+        'u': 'oh', 'oo': 'oh',  # Back vowels
+        'f': 'narrow', 'v': 'narrow',  # Fricatives
+        'th': 'teeth', 't': 'narrow', 'd': 'narrow', 'n': 'narrow',  # Dentals
+        'rest': 'rest'
+    }
+    
     @staticmethod
     def get_mouth_for_phoneme(phoneme: str) -> str:
         """Get mouth shape based on phoneme"""
-        phoneme_map = {
-            'p': 'oh', 'b': 'oh', 'm': 'oh',  # Bilabial
-            'a': 'open', 'o': 'oh',  # Vowels
-            'e': 'narrow', 'i': 'narrow',  # Front vowels
-            'u': 'oh', 'oo': 'oh',  # Back vowels
-            'f': 'narrow', 'v': 'narrow',  # Fricatives
-            'th': 'teeth', 't': 'narrow', 'd': 'narrow', 'n': 'narrow',  # Dentals
-            'rest': 'rest'
-        }
-        return MouthShapes.SHAPES.get(phoneme_map.get(phoneme, 'rest'), MouthShapes.SHAPES['rest'])
+        return MouthShapes.SHAPES.get(MouthShapes.PHONEME_MAP.get(phoneme, 'rest'), MouthShapes.SHAPES['rest'])
 
 class AnimationEngine:
     """Generate SVG animations and frame sequences"""
     
     FRAME_RATE = 30  # FPS for animation
     
+    # Rendered SVG fragments, keyed by everything that changes them. They are
+    # immutable, so a server that builds them before forking shares them.
+    SPRITE_CACHE_SIZE = 1024
+    _backgrounds = {}
+    _sprites = {}
+    
+    @staticmethod
+    def prebuild_caches(characters: dict, backgrounds, width: int = 1280, height: int = 720) -> dict:
+        """Render every predefined background and character look ahead of time"""
+        for background_type in backgrounds:
+            AnimationEngine.create_background_svg(background_type, width, height)
+        for character in characters.values():
+            expressions = set(character.get('expressions', [])) | {'neutral'}
+            for expression in expressions:
+                for mouth_shape in MouthShapes.SHAPES:
+                    AnimationEngine.get_character_sprite(character.get('color', '#FF6B6B'), expression, mouth_shape)
+        return AnimationEngine.cache_stats()
+    
+    @staticmethod
+    def cache_stats() -> dict:
+        return {
+            'backgrounds': len(AnimationEngine._backgrounds),
+            'sprites': len(AnimationEngine._sprites),
+            'bytes': sum(len(svg) for svg in AnimationEngine._backgrounds.values())
+                     + sum(len(svg) for svg in AnimationEngine._sprites.values())
+        }
+    
     @staticmethod
     def create_character_svg(character: dict, position: dict, expression: str = 'neutral', mouth_shape: str = 'rest', is_speaking: bool = False) -> str:
         """Create an SVG representation of a character with animated mouth"""
@@ -42,12 +71,30 @@ class AnimationEngine:
         color = character.get('color', '#FF6B6B')
         name = character.get('name', 'Character')
         
+        return (f'''
+        <g id="character-{name}" transform="translate({x}, {y})">'''
+                + AnimationEngine.get_character_sprite(color, expression, mouth_shape)
+                + '''</g>
+        ''')
+    
+    @staticmethod
+    def get_character_sprite(color: str, expression: str = 'neutral', mouth_shape: str = 'rest') -> str:
+        """Return the character drawing (without placement), built once per look"""
+        key = (color, expression, mouth_shape)
+        sprite = AnimationEngine._sprites.get(key)
+        if sprite is None:
+            sprite = AnimationEngine._build_character_sprite(color, expression, mouth_shape)
+            if len(AnimationEngine._sprites) < AnimationEngine.SPRITE_CACHE_SIZE:
+                AnimationEngine._sprites[key] = sprite
+        return sprite
+    
+    @staticmethod
+    def _build_character_sprite(color: str, expression: str, mouth_shape: str) -> str:
         # Get mouth path based on shape
         mouth_path = MouthShapes.SHAPES.get(mouth_shape, MouthShapes.SHAPES['rest'])
         
         # Enhanced character with better proportions and animated mouth
         svg = f'''
-        <g id="character-{name}" transform="translate({x}, {y})">
             <!-- Shadow (subtle) -->
             <ellipse cx="0" cy="72" rx="32" ry="8" fill="rgba(0,0,0,0.15)"/>
             
@@ -140,7 +187,6 @@ class AnimationEngine:
             <ellipse cx="10" cy="75" rx="10" ry="6" fill="#333" stroke="#222" stroke-width="1.5"/>
             <line x1="-14" y1="75" x2="-6" y2="75" stroke="#FFD700" stroke-width="1" opacity="0.6"/>
             <line x1="6" y1="75" x2="14" y2="75" stroke="#FFD700" stroke-width="1" opacity="0.6"/>
-        </g>
         '''
         
         return svg
@@ -148,6 +194,16 @@ class AnimationEngine:
     @staticmethod
     def create_background_svg(background_type: str, width: int = 1280, height: int = 720) -> str:
         """Create an SVG background with improved visuals"""
+        key = (background_type, width, height)
+        background = AnimationEngine._backgrounds.get(key)
+        if background is None:
+            background = AnimationEngine._build_background_svg(background_type, width, height)
+            if len(AnimationEngine._backgrounds) < AnimationEngine.SPRITE_CACHE_SIZE:
+                AnimationEngine._backgrounds[key] = background
+        return background
+    
+    @staticmethod
+    def _build_background_svg(background_type: str, width: int, height: int) -> str:
         backgrounds = {
             'forest': f'''
             <defs>
@@ -412,6 +468,7 @@ class AnimationEngine:
         # Get narration and determine speaking character
         narration = scene.get('narration', '')
         is_speaking_frame = frame_num > 0  # Character speaks for most of scene
+        mouth_shapes = scene.get('mouth_shapes')  # Per-frame shapes from the narration audio
         
         # Add characters with animations applied
         scene_characters = scene.get('characters', [])
@@ -443,9 +500,12 @@ class AnimationEngine:
                 position = char_ref.get('position', {'x': 0.3 + (idx * 0.2), 'y': 0.65})
                 expression = char_ref.get('expression', 'neutral')
             
-            # Determine mouth shape based on narration and frame
+            # Determine mouth shape from lip-sync data, or from narration and frame
             mouth_shape = 'rest'
-            if is_speaking_frame and narration:
+            if mouth_shapes is not None:
+                if frame_num < len(mouth_shapes):
+                    mouth_shape = mouth_shapes[frame_num]
+            elif is_speaking_frame and narration:
                 # Animate mouth based on narration text and frame
                 phoneme_index = (frame_num // 3) % len(narration)
                 mouth_shape = MouthShapes.get_mouth_for_phoneme(narration[phoneme_index].lower())
@@ -1,76 +1,186 @@
-import pyttsx3
+import importlib
 import os
+import time
 import uuid
+from concurrent.futures import Future
 from pathlib import Path
 import wave
+from app.services.tts_pool import get_tts_pool, create_engine
+from app.services.tts_cache import TTSCache
+from app.services.single_flight import SingleFlight
+from app.services.metrics import Metrics
 
 class AudioService:
     """Generate audio and handle TTS"""
     
+    TTS_RATE = 150  # Slower speech for clarity
+    TTS_VOLUME = 0.9
+    
+    # Seconds of silence left after the narration when planning a scene
+    SCENE_PADDING = float(os.getenv('SCENE_PADDING', 0.75))
+    
+    # Use correct path relative to project root
+    STORAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'storage', 'audio')
+    
     def __init__(self):
+        import pyttsx3
         self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)  # Slower speech for clarity
-        self.engine.setProperty('volume', 0.9)
+        self.engine.setProperty('rate', AudioService.TTS_RATE)
+        self.engine.setProperty('volume', AudioService.TTS_VOLUME)
+    
+    _cache = None
+    _in_flight = SingleFlight()
     
     @staticmethod
-    def generate_audio(text: str, scene_id: str = None) -> str:
-        """Generate audio from text and return filename"""
-        engine = pyttsx3.init()
-        engine.setProperty('rate', 150)
-        engine.setProperty('volume', 0.9)
+    def get_cache() -> TTSCache:
+        """Return the content-addressed cache of synthesized audio"""
+        if AudioService._cache is None:
+            AudioService._cache = TTSCache(os.path.join(AudioService.STORAGE_DIR, 'cache'))
+        return AudioService._cache
+    
+    @staticmethod
+    def synthesize_async(text: str, filepath: str) -> Future:
+        """Produce filepath from text, reusing cached audio when possible.
+
+        Identical narration is synthesized once; later and concurrent requests
+        hard-link the cached WAV into place. Files only ever appear through an
+        atomic rename, so readers never see a partial WAV. The future
+        resolves to filepath.
+        """
+        cache = AudioService.get_cache()
+        key = cache.key(text, AudioService.TTS_RATE, AudioService.TTS_VOLUME)
         
-        filename = f"narration_{scene_id if scene_id else uuid.uuid4()}.wav"
+        cached_path = cache.lookup(key)
+        if cached_path:
+            future = Future()
+            try:
+                cache.link(cached_path, filepath)
+                future.set_result(filepath)
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        
+        def _synthesize_entry():
+            # Another caller may have finished this key since our lookup
+            cached_path = cache.lookup(key)
+            if cached_path:
+                done = Future()
+                done.set_result(cached_path)
+                return done
+            started_at = time.perf_counter()
+            synthesis = AudioService._synthesize_uncached(text, cache.temp_path(key))
+            synthesis.add_done_callback(lambda done: Metrics.observe_stage('tts', time.perf_counter() - started_at))
+            return AudioService._then(synthesis, lambda tmp_path: _store(tmp_path))
+        
+        def _store(tmp_path):
+            cache_path = cache.store(key, tmp_path)
+            # Every fresh synthesis is a free measurement for the duration model
+            try:
+                from app.services.duration_model import DurationModel
+                DurationModel.observe(key, text, AudioService.TTS_RATE, AudioService.wav_duration(cache_path))
+            except Exception as e:
+                print(f"Error recording narration duration: {e}")
+            return cache_path
         
-        # Use correct path relative to project root
-        storage_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'storage', 'audio')
-        filepath = os.path.join(storage_dir, filename)
-        os.makedirs(storage_dir, exist_ok=True)
+        def _link(cache_path):
+            cache.link(cache_path, filepath)
+            return filepath
         
+        # Concurrent misses for the same audio share one synthesis
+        entry = AudioService._in_flight.do_async(key, _synthesize_entry)
+        return AudioService._then(entry, _link)
+    
+    @staticmethod
+    def warm_up():
+        """Load the numeric modules and start the TTS workers ahead of the first request"""
+        # Imported for its side effect of loading numpy ahead of the first lip-sync request
+        importlib.import_module('app.services.lip_sync')
+        from app.services.duration_model import DurationModel
+        DurationModel.refresh()
+        get_tts_pool().warm_up()
+    
+    @staticmethod
+    def _synthesize_uncached(text: str, filepath: str) -> Future:
+        """Queue text for synthesis on the TTS worker pool; resolves to filepath"""
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+        pool = get_tts_pool()
+        if pool.size == 0:
+            # No worker processes configured: synthesize in this thread
+            future = Future()
+            try:
+                engine = create_engine(AudioService.TTS_RATE, AudioService.TTS_VOLUME)
+                engine.save_to_file(text, filepath)
+                engine.runAndWait()
+                future.set_result(filepath)
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        
+        return pool.submit(text, filepath, rate=AudioService.TTS_RATE, volume=AudioService.TTS_VOLUME)
+    
+    @staticmethod
+    def _then(future: Future, fn) -> Future:
+        """Return a future for fn(result) once future succeeds"""
+        result = Future()
+        
+        def _done(source):
+            error = source.exception()
+            if error is not None:
+                result.set_exception(error)
+                return
+            try:
+                result.set_result(fn(source.result()))
+            except Exception as e:
+                result.set_exception(e)
+        
+        future.add_done_callback(_done)
+        return result
+    
+    @staticmethod
+    def generate_audio_async(text: str, scene_id: str = None) -> Future:
+        """Start generating audio from text; the future resolves to the filename"""
+        filename = f"narration_{scene_id if scene_id else uuid.uuid4()}.wav"
+        filepath = os.path.join(AudioService.STORAGE_DIR, filename)
+        
+        return AudioService._then(AudioService.synthesize_async(text, filepath), lambda _: filename)
+    
+    @staticmethod
+    def generate_audio(text: str, scene_id: str = None) -> str:
+        """Generate audio from text and return filename"""
         try:
-            engine.save_to_file(text, filepath)
-            engine.runAndWait()
-            return filename
+            return AudioService.generate_audio_async(text, scene_id).result()
         except Exception as e:
             print(f"Error generating audio: {e}")
             raise
     
     @staticmethod
-    def get_audio_duration(filename: str) -> float:
+    def wav_duration(filepath: str) -> float:
+        """Return the length of a WAV file in seconds"""
+        with wave.open(filepath, 'rb') as wav_file:
+            return wav_file.getnframes() / wav_file.getframerate()
+    
+    @staticmethod
+    def get_audio_duration(filename: str, text: str = None) -> float:
         """Get duration of WAV audio file"""
         try:
-            filepath = os.path.join(os.getcwd(), 'storage', 'audio', filename)
-            with wave.open(filepath, 'rb') as wav_file:
-                frames = wav_file.getnframes()
-                rate = wav_file.getframerate()
-                duration = frames / rate
-                return duration
+            return AudioService.wav_duration(os.path.join(AudioService.STORAGE_DIR, filename))
         except Exception as e:
             print(f"Error getting audio duration: {e}")
             # Fallback: estimate based on text length if available
-            return 4.0
+            return AudioService.estimate_duration(text) if text else 4.0
     
     @staticmethod
     def generate_narration(text: str, filename: str = None) -> dict:
         """Generate audio from text using text-to-speech"""
-        engine = pyttsx3.init()
-        engine.setProperty('rate', 150)
-        engine.setProperty('volume', 0.9)
-        
         if filename is None:
             filename = f"narration_{uuid.uuid4()}.wav"
         
-        # Use correct path relative to project root
-        storage_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'storage', 'audio')
-        filepath = os.path.join(storage_dir, filename)
-        os.makedirs(storage_dir, exist_ok=True)
+        filepath = os.path.join(AudioService.STORAGE_DIR, filename)
         
         try:
-            engine.save_to_file(text, filepath)
-            engine.runAndWait()
-            
-            # Estimate duration (rough calculation)
-            word_count = len(text.split())
-            duration = word_count / 2.5  # Approximate words per second
+            AudioService.synthesize_async(text, filepath).result()
+            duration = AudioService.get_audio_duration(filename, text)
             
             return {
                 'success': True,
@@ -87,16 +197,67 @@ class AudioService:
     
     @staticmethod
     def estimate_duration(text: str) -> float:
-        """Estimate audio duration from text"""
-        # Average speaking rate: 150 words per minute
-        words = len(text.split())
-        return (words / 150) * 60  # Convert to seconds
+        """Estimate audio duration from text without synthesizing it"""
+        from app.services.duration_model import DurationModel
+        return DurationModel.predict(text, AudioService.TTS_RATE)
     
     @staticmethod
-    def generate_mouth_animation_frames(duration: float, frame_rate: int = 30) -> list:
+    def estimate_scene_duration(narration: str, minimum: float = 3.0) -> float:
+        """Plan a scene long enough for its narration plus a short lead-out"""
+        if not narration or not narration.strip():
+            return minimum
+        return max(minimum, round(AudioService.estimate_duration(narration) + AudioService.SCENE_PADDING, 2))
+    
+    @staticmethod
+    def scene_audio_path(scene_id: str) -> str:
+        """Return the path of a scene's narration WAV, or None if none has been generated"""
+        for filename in (f"narration_{scene_id}.wav", f"{scene_id}.wav"):
+            filepath = os.path.join(AudioService.STORAGE_DIR, filename)
+            if os.path.exists(filepath):
+                return filepath
+        return None
+    
+    @staticmethod
+    def remove_scene_audio(scene_id: str):
+        """Delete a scene's narration WAVs and the sidecars derived from them"""
+        for filename in (f"narration_{scene_id}.wav", f"{scene_id}.wav"):
+            filepath = os.path.join(AudioService.STORAGE_DIR, filename)
+            for path in (filepath, f'{filepath}.lipsync.json', f'{filepath}.key'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+    
+    @staticmethod
+    def get_lip_sync(scene_id: str, frame_rate: int = 30) -> list:
+        """Return per-frame mouth shapes for a scene's narration, or None without audio"""
+        filepath = AudioService.scene_audio_path(scene_id)
+        if not filepath:
+            return None
+        try:
+            from app.services.lip_sync import LipSync
+            return LipSync.get(filepath, frame_rate)['shapes']
+        except Exception as e:
+            print(f"Error analyzing audio for lip-sync: {e}")
+            return None
+    
+    @staticmethod
+    def generate_mouth_animation_frames(duration: float, frame_rate: int = 30, filename: str = None) -> list:
         """Generate mouth animation frames synchronized with audio"""
+        if filename:
+            filepath = os.path.join(AudioService.STORAGE_DIR, filename)
+            if os.path.exists(filepath):
+                from app.services.lip_sync import LipSync
+                analysis = LipSync.get(filepath, frame_rate)
+                return [
+                    {'frame': i, 'mouth_shape': shape, 'intensity': energy}
+                    for i, (shape, energy) in enumerate(zip(analysis['shapes'], analysis['energy']))
+                ]
+        
+        # Without audio, cycle through MouthShapes keys from closed to wide open,
+        # the same vocabulary the audio analysis returns
         frames = int(duration * frame_rate)
-        mouth_shapes = ['closed', 'open_small', 'open_medium', 'open_large']
+        mouth_shapes = ['rest', 'narrow', 'open', 'wide']
         
         keyframes = []
         for i in range(frames):
@@ -0,0 +1,178 @@
+import os
+import shutil
+import subprocess
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app.services.disk_cache import ContentAddressedCache
+from app.services.single_flight import SingleFlight
+from app.services.tts_cache import TTSCache
+
+
+class VariantStore(ContentAddressedCache):
+    """Size-bounded store of one format's transcodes, named by TTS cache key"""
+
+    def __init__(self, cache_dir: str, extension: str, max_bytes: int):
+        super().__init__(cache_dir, max_bytes)
+        self.EXTENSION = extension
+        self._stats = {'stores': 0, 'evictions': 0}
+
+
+class AudioVariants:
+    """Compressed copies of narration WAVs, transcoded in the background with FFmpeg.
+
+    Variants live under <audio_dir>/variants/<format>/, keyed on the TTS
+    cache key of the WAV they were made from (TTSCache.linked_key), so
+    scenes sharing a cached TTS entry share one transcode. WAVs without a
+    known key are always served as WAV.
+    """
+
+    # format -> (mimetype, extension, ffmpeg codec arguments)
+    FORMATS = {
+        'aac': ('audio/mp4', '.m4a', ['-c:a', 'aac', '-b:a', '64k', '-movflags', '+faststart']),
+        'opus': ('audio/ogg', '.opus', ['-c:a', 'libopus', '-b:a', '32k', '-application', 'voip'])
+    }
+
+    # Clients must ask for these explicitly to get Opus; wildcards get AAC
+    OPUS_MIMETYPES = ('audio/ogg', 'audio/opus')
+
+    WORKERS = int(os.getenv('AUDIO_TRANSCODE_WORKERS', 1))
+    TIMEOUT = float(os.getenv('AUDIO_TRANSCODE_TIMEOUT', 120))
+    # Disk budget for each format's variants
+    MAX_BYTES = int(os.getenv('AUDIO_VARIANT_MAX_BYTES', 128 * 1024 * 1024))
+
+    _executor = None
+    _lock = threading.Lock()
+    _in_flight = SingleFlight()
+    _stores = {}
+    _ffmpeg = None
+
+    @staticmethod
+    def ffmpeg_available() -> bool:
+        if AudioVariants._ffmpeg is None:
+            AudioVariants._ffmpeg = shutil.which('ffmpeg') is not None
+        return AudioVariants._ffmpeg
+
+    @staticmethod
+    def get_store(audio_dir: str, fmt: str) -> VariantStore:
+        """Return the variant store of one format for an audio directory"""
+        cache_dir = os.path.join(audio_dir, 'variants', fmt)
+        with AudioVariants._lock:
+            store = AudioVariants._stores.get(cache_dir)
+            if store is None:
+                store = VariantStore(cache_dir, AudioVariants.FORMATS[fmt][1], AudioVariants.MAX_BYTES)
+                AudioVariants._stores[cache_dir] = store
+            return store
+
+    @staticmethod
+    def variant_path(wav_path: str, fmt: str) -> str:
+        """Return where the fmt variant of wav_path is (or will be) stored, or None if its content is unknown"""
+        key = TTSCache.linked_key(wav_path)
+        if key is None:
+            return None
+        return AudioVariants.get_store(os.path.dirname(wav_path), fmt).path_for(key)
+
+    @staticmethod
+    def negotiate(accept, requested: str = None) -> str:
+        """Pick 'opus', 'aac' or 'wav' from an explicit choice or an Accept header"""
+        if requested in AudioVariants.FORMATS or requested == 'wav':
+            return requested
+
+        explicit = {value.split(';')[0].strip().lower(): quality for value, quality in accept}
+        if any(explicit.get(mimetype, 0) > 0 for mimetype in AudioVariants.OPUS_MIMETYPES):
+            return 'opus'
+        if accept.quality('audio/mp4') > 0 or accept.quality('audio/aac') > 0:
+            return 'aac'
+        return 'wav'
+
+    @staticmethod
+    def choose(wav_path: str, request):
+        """Return (path, mimetype, etag) to serve wav_path for a Flask request.
+
+        An explicit ?format= names one representation, so it waits for a
+        missing variant rather than serving the WAV in the meantime. A
+        negotiated request switches from the WAV to a variant once it is
+        ready, which would hand a player seeking with Range a slice of a
+        different file; Range requests therefore only get a variant when
+        If-Range lets the ETag (the TTS cache key plus format) guard them.
+        """
+        requested = request.args.get('format')
+        fmt = AudioVariants.negotiate(request.accept_mimetypes, requested)
+        if requested is None and 'Range' in request.headers and 'If-Range' not in request.headers:
+            fmt = 'wav'
+        path, mimetype = AudioVariants.select(wav_path, fmt, wait=requested is not None)
+
+        key = TTSCache.linked_key(wav_path)
+        etag = f'{key}-{fmt if path != wav_path else "wav"}' if key else None
+        return path, mimetype, etag
+
+    @staticmethod
+    def select(wav_path: str, fmt: str, wait: bool = False):
+        """Return (path, mimetype) to serve for wav_path in the wanted format.
+
+        With wait, a missing variant is transcoded before returning.
+        Otherwise it is queued for transcoding and the WAV is served until
+        it is ready.
+        """
+        if fmt in AudioVariants.FORMATS and AudioVariants.ffmpeg_available():
+            path = AudioVariants.variant_path(wav_path, fmt)
+            if path and not os.path.exists(path):
+                transcode = AudioVariants.schedule(wav_path, path, fmt)
+                if wait:
+                    try:
+                        transcode.result(timeout=AudioVariants.TIMEOUT)
+                    except Exception as e:
+                        print(f"Error waiting for audio transcode: {e}")
+            if path:
+                try:
+                    # Keep recently served variants from being evicted
+                    os.utime(path)
+                    return path, AudioVariants.FORMATS[fmt][0]
+                except OSError:
+                    pass
+        return wav_path, 'audio/wav'
+
+    @staticmethod
+    def schedule(wav_path: str, output_path: str, fmt: str):
+        """Queue a background transcode of wav_path unless one is already running"""
+        return AudioVariants._in_flight.do_async(
+            output_path,
+            lambda: AudioVariants._get_executor().submit(AudioVariants.transcode, wav_path, output_path, fmt)
+        )
+
+    @staticmethod
+    def transcode(wav_path: str, output_path: str, fmt: str) -> bool:
+        """Encode wav_path to output_path with FFmpeg, publishing it atomically"""
+        if os.path.exists(output_path):
+            return True
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        extension = AudioVariants.FORMATS[fmt][1]
+        tmp_path = f'{output_path}.{uuid.uuid4().hex}.tmp{extension}'
+        cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', wav_path, '-vn']
+        cmd.extend(AudioVariants.FORMATS[fmt][2])
+        cmd.extend(['-y', tmp_path])
+
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=AudioVariants.TIMEOUT)
+            if result.returncode != 0:
+                print(f"Error transcoding audio to {fmt}: {result.stderr}")
+                return False
+            AudioVariants.get_store(os.path.dirname(wav_path), fmt)._replace(tmp_path, output_path)
+            return True
+        except Exception as e:
+            print(f"Error transcoding audio to {fmt}: {e}")
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _get_executor() -> ThreadPoolExecutor:
+        with AudioVariants._lock:
+            if AudioVariants._executor is None:
+                AudioVariants._executor = ThreadPoolExecutor(
+                    max_workers=AudioVariants.WORKERS,
+                    thread_name_prefix='audio-transcode'
+                )
+            return AudioVariants._executor
@@ -0,0 +1,84 @@
+import os
+import threading
+
+
+class ContentAddressedCache:
+    """Size-bounded directory of files named by content hash.
+
+    Entries live under <cache_dir>/<key[:2]>/<key><EXTENSION>. The total
+    size is tracked per process (scanned once, then adjusted on every store
+    and removal), and the least recently modified entries are deleted once
+    it grows past max_bytes. Subclasses define the entry format and keep
+    'stores' and 'evictions' counters in self._stats.
+    """
+
+    EXTENSION = ''
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}{self.EXTENSION}')
+
+    def _replace(self, source_path: str, path: str):
+        """Atomically move source_path over the entry at path, keeping the size total exact"""
+        size = os.path.getsize(source_path)
+        with self._lock:
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(source_path, path)
+            self._stats['stores'] += 1
+            if self._total_bytes is not None:
+                self._total_bytes += size - replaced
+        self._evict_if_needed()
+
+    def _remove(self, path: str):
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def _entries(self):
+        """List (mtime, size, path) for every cache entry"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(self.EXTENSION) and '.tmp' not in entry.name:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            if self._total_bytes <= self.max_bytes:
+                return
+
+            # Trim to 90% of the budget so eviction does not run on every store
+            target = int(self.max_bytes * 0.9)
+            for _, size, path in sorted(self._entries()):
+                if self._total_bytes <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._total_bytes -= size
+                self._stats['evictions'] += 1
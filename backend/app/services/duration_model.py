@@ -0,0 +1,158 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from app.models.database import query_db, execute_db
+from app.services.tts_cache import TTSCache
+
+
+class DurationModel:
+    """Predict narration length from text, calibrated against synthesized audio.
+
+    Speech time is modelled as a linear function of word, syllable, pause
+    and sentence-stop counts at the base rate, scaled by BASE_RATE / rate.
+    Every WAV newly synthesized by a real engine is stored as a sample in
+    duration_samples, tagged with the engine build, and each process folds in the rows it has not yet seen (including other
+    processes' samples) rather than refitting from scratch. A ridge prior
+    keeps predictions near 150 words per minute until enough samples exist.
+    """
+
+    BASE_RATE = 150
+
+    # Seconds at BASE_RATE for: constant, word, syllable, pause (, ; :), stop (. ! ?)
+    PRIOR = (0.2, 0.25, 0.12, 0.25, 0.4)
+    PRIOR_WEIGHT = float(os.getenv('DURATION_PRIOR_WEIGHT', 5.0))
+
+    # Seconds between checks for samples recorded by other processes
+    REFRESH_INTERVAL = float(os.getenv('DURATION_REFRESH_INTERVAL', 60))
+
+    MIN_DURATION = 0.3
+
+    _WORD = re.compile(r"[A-Za-z0-9']+")
+    _VOWEL_GROUP = re.compile(r'[aeiouy]+')
+
+    _lock = threading.Lock()
+    _xtx = None
+    _xty = None
+    _weights = None
+    _samples = 0
+    _last_rowid = 0
+    _refreshed_at = 0.0
+
+    @staticmethod
+    def count_syllables(word: str) -> int:
+        """Rough English syllable count from vowel groups"""
+        word = word.lower().strip("'")
+        if word.isdigit():
+            # Digits are read out as words; assume about two syllables each
+            return 2 * len(word)
+        count = len(DurationModel._VOWEL_GROUP.findall(word))
+        if word.endswith('e') and not word.endswith(('le', 'ee')) and count > 1:
+            count -= 1
+        return max(1, count)
+
+    @staticmethod
+    def features(text: str) -> tuple:
+        """Return (words, syllables, pauses, stops) for text"""
+        words = DurationModel._WORD.findall(text or '')
+        syllables = sum(DurationModel.count_syllables(word) for word in words)
+        pauses = len(re.findall(r'[,;:—]', text or ''))
+        stops = len(re.findall(r'[.!?]+', text or ''))
+        return len(words), syllables, pauses, stops
+
+    @staticmethod
+    def predict(text: str, rate: int = None) -> float:
+        """Predict the spoken duration of text in seconds"""
+        words, syllables, pauses, stops = DurationModel.features(text)
+        if words == 0:
+            return 0.0
+
+        weights = DurationModel._get_weights()
+        x = np.array([1.0, words, syllables, pauses, stops])
+        seconds = float(x @ weights) * DurationModel.BASE_RATE / (rate or DurationModel.BASE_RATE)
+        return round(max(DurationModel.MIN_DURATION, seconds), 2)
+
+    @staticmethod
+    def observe(audio_key: str, text: str, rate: int, duration: float):
+        """Record the measured duration of a synthesized narration"""
+        engine = TTSCache.engine_version()
+        if engine == 'silent':
+            # The stand-in engine's audio is as long as predict() says; fitting it teaches nothing
+            return
+        words, syllables, pauses, stops = DurationModel.features(text)
+        if words == 0 or duration <= 0:
+            return
+
+        execute_db(
+            '''INSERT OR IGNORE INTO duration_samples
+               (audio_key, words, syllables, pauses, stops, rate, duration, engine, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (audio_key, words, syllables, pauses, stops, rate, duration, engine, datetime.now().isoformat())
+        )
+        DurationModel.refresh()
+
+    @staticmethod
+    def refresh():
+        """Fold samples recorded since the last refresh into the fit"""
+        with DurationModel._lock:
+            DurationModel._ensure_initialized()
+            DurationModel._refreshed_at = time.monotonic()
+            rows = query_db(
+                '''SELECT rowid, words, syllables, pauses, stops, rate, duration
+                   FROM duration_samples WHERE rowid > ? AND engine = ? ORDER BY rowid''',
+                (DurationModel._last_rowid, TTSCache.engine_version())
+            )
+            if not rows:
+                return
+
+            data = np.array([tuple(row) for row in rows], dtype=np.float64)
+            x = np.column_stack([np.ones(len(data)), data[:, 1:5]])
+            # Normalize each measurement to the base rate
+            y = data[:, 6] * data[:, 5] / DurationModel.BASE_RATE
+
+            DurationModel._xtx += x.T @ x
+            DurationModel._xty += x.T @ y
+            DurationModel._samples += len(data)
+            DurationModel._last_rowid = int(data[-1, 0])
+            DurationModel._weights = DurationModel._solve()
+
+    @staticmethod
+    def stats() -> dict:
+        weights = DurationModel._get_weights()
+        return {
+            'samples': DurationModel._samples,
+            'weights': dict(zip(('constant', 'word', 'syllable', 'pause', 'stop'),
+                                np.round(weights, 4).tolist()))
+        }
+
+    @staticmethod
+    def _ensure_initialized():
+        if DurationModel._xtx is None:
+            DurationModel._xtx = np.zeros((5, 5))
+            DurationModel._xty = np.zeros(5)
+            DurationModel._weights = np.array(DurationModel.PRIOR)
+
+    @staticmethod
+    def _solve():
+        """Ridge solution pulled toward PRIOR"""
+        penalty = DurationModel.PRIOR_WEIGHT * np.eye(5)
+        prior = np.array(DurationModel.PRIOR)
+        try:
+            weights = np.linalg.solve(DurationModel._xtx + penalty,
+                                      DurationModel._xty + penalty @ prior)
+        except np.linalg.LinAlgError:
+            return prior
+        return weights
+
+    @staticmethod
+    def _get_weights():
+        if time.monotonic() - DurationModel._refreshed_at > DurationModel.REFRESH_INTERVAL:
+            try:
+                DurationModel.refresh()
+            except Exception as e:
+                print(f"Error refreshing duration model: {e}")
+        with DurationModel._lock:
+            DurationModel._ensure_initialized()
+            return DurationModel._weights
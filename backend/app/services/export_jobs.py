@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from app.models.async_db import AsyncDB
+from app.models.scene_cache import SceneCache
+from app.services.admission import Admission, ADMISSION_ENABLED
+from app.services.animation_engine import AnimationEngine
+from app.services.audio_service import AudioService
+from app.services.metrics import Metrics
+from app.services.render_pool import RenderPool
+from app.services.story_generator import StoryGenerator
+from app.services.video_export import VideoExportService
+
+
+class ExportJob:
+    """Progress of one video export run by the async server"""
+
+    def __init__(self, project_id: str):
+        self.id = str(uuid.uuid4())
+        self.project_id = project_id
+        self.state = 'queued'
+        self.frames_rendered = 0
+        self.total_frames = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.version = 0
+        self.task = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ('done', 'failed')
+
+    async def update(self, **fields):
+        """Change the job and wake everyone watching it"""
+        async with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    async def wait_for_change(self, version: int, timeout: float) -> bool:
+        """Wait until the job moves past version; False if timeout passed first"""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait_for(lambda: self.version != version), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.id,
+            'project_id': self.project_id,
+            'state': self.state,
+            'frames_rendered': self.frames_rendered,
+            'total_frames': self.total_frames,
+            'progress': round(self.frames_rendered / self.total_frames, 3) if self.total_frames else 0.0,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class ExportJobs:
+    """Registry and runner for async video exports.
+
+    Frames are rendered in chunks on the render process pool, the soundtrack
+    is mixed there too, and FFmpeg runs as an asyncio subprocess, so an
+    export holds no server thread while it runs. Jobs take an 'export'
+    admission slot, shared with the synchronous render and export routes,
+    and a project has at most one unfinished job.
+    """
+
+    # Frames per render task; smaller chunks report progress more often
+    CHUNK_FRAMES = int(os.getenv('EXPORT_CHUNK_FRAMES', 60))
+
+    # Finished jobs kept for status queries
+    MAX_FINISHED = int(os.getenv('EXPORT_JOBS_KEEP', 100))
+
+    _jobs = OrderedDict()
+    _active = {}
+
+    @staticmethod
+    def active(project_id: str) -> ExportJob:
+        """Return the project's unfinished export, if any"""
+        return ExportJobs._active.get(project_id)
+
+    @staticmethod
+    async def start(project_id: str) -> tuple:
+        """Return (job, created): the project's unfinished export, or a new one on the running loop.
+
+        Waits for an 'export' admission slot like the synchronous routes and
+        raises AdmissionRejected when none frees up in time.
+        """
+        job = ExportJobs.active(project_id)
+        if job is not None:
+            return job, False
+
+        admitted_at = None
+        if ADMISSION_ENABLED:
+            acquiring = asyncio.ensure_future(asyncio.to_thread(Admission.acquire, 'export'))
+            try:
+                admitted_at = await asyncio.shield(acquiring)
+            except asyncio.CancelledError:
+                # The request went away while waiting; give back a slot granted afterwards
+                acquiring.add_done_callback(ExportJobs._release_abandoned)
+                raise
+            job = ExportJobs.active(project_id)
+            if job is not None:
+                # Another request started this project's export while we waited
+                Admission.release('export', admitted_at)
+                return job, False
+
+        job = ExportJob(project_id)
+        ExportJobs._jobs[job.id] = job
+        ExportJobs._active[project_id] = job
+        ExportJobs._prune()
+        job.task = asyncio.get_running_loop().create_task(ExportJobs.run(job, admitted_at))
+        return job, True
+
+    @staticmethod
+    def get(job_id: str) -> ExportJob:
+        return ExportJobs._jobs.get(job_id)
+
+    @staticmethod
+    async def run(job: ExportJob, admitted_at: float = None):
+        try:
+            await ExportJobs._export(job)
+        finally:
+            ExportJobs._active.pop(job.project_id, None)
+            if admitted_at is not None:
+                Admission.release('export', admitted_at)
+
+    @staticmethod
+    async def _export(job: ExportJob):
+        try:
+            await job.update(state='rendering')
+            scenes = await AsyncDB.run(SceneCache.get_project_scenes, job.project_id)
+            if not scenes:
+                await job.update(state='failed', error='No scenes found')
+                return
+
+            frame_dir = f'storage/frames/{job.project_id}'
+            os.makedirs(frame_dir, exist_ok=True)
+            char_defs = StoryGenerator.get_available_characters()
+
+            chunks = []
+            soundtrack_segments = []
+            frame_count = 0
+            for scene_data in scenes:
+                mouth_shapes = await asyncio.to_thread(
+                    AudioService.get_lip_sync, scene_data['id'], AnimationEngine.FRAME_RATE
+                )
+                scene = {
+                    'background_type': scene_data['background_type'] or 'forest',
+                    'characters': scene_data['characters'],
+                    'mouth_shapes': mouth_shapes
+                }
+                num_frames = int(float(scene_data['duration'] or 3.0) * AnimationEngine.FRAME_RATE)
+                soundtrack_segments.append((
+                    AudioService.scene_audio_path(scene_data['id']),
+                    num_frames / AnimationEngine.FRAME_RATE
+                ))
+                for start in range(0, num_frames, ExportJobs.CHUNK_FRAMES):
+                    stop = min(start + ExportJobs.CHUNK_FRAMES, num_frames)
+                    chunks.append((scene, char_defs, frame_dir, frame_count, start, stop))
+                frame_count += num_frames
+            await job.update(total_frames=frame_count)
+
+            # Keep at most one chunk per render worker in flight, so one job
+            # cannot queue its whole video ahead of everyone else's work
+            in_flight = asyncio.Semaphore(RenderPool.WORKERS)
+
+            async def render(chunk):
+                async with in_flight:
+                    return await RenderPool.run(VideoExportService.render_scene_frames, *chunk)
+
+            with Metrics.stage_timer('render'):
+                for rendered in asyncio.as_completed([render(chunk) for chunk in chunks]):
+                    await job.update(frames_rendered=job.frames_rendered + await rendered)
+
+            # Assemble the scene narrations into one soundtrack aligned to the frames
+            audio_path = None
+            if any(path for path, _ in soundtrack_segments):
+                from app.services.soundtrack import SoundtrackBuilder
+                audio_path = os.path.join(frame_dir, 'soundtrack.wav')
+                with Metrics.stage_timer('mux'):
+                    await RenderPool.run(SoundtrackBuilder.build, soundtrack_segments, audio_path)
+
+            await job.update(state='encoding')
+            output_path = f'storage/videos/{job.project_id}.mp4'
+            result = await VideoExportService.create_video_from_frames_async(
+                frame_dir, output_path, audio_path, frame_rate=AnimationEngine.FRAME_RATE
+            )
+
+            if result['success']:
+                await job.update(state='done', result={
+                    'video_path': output_path,
+                    'download_url': f'/videos/{job.project_id}.mp4',
+                    'file_size': result.get('file_size', 0)
+                })
+            else:
+                await job.update(state='failed', error=result.get('error', 'Export failed'))
+        except Exception as e:
+            print(f"Error exporting video for project {job.project_id}: {e}")
+            await job.update(state='failed', error=str(e))
+
+    @staticmethod
+    def _release_abandoned(acquiring):
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            Admission.release('export', acquiring.result())
+
+    @staticmethod
+    def _prune():
+        finished = [job_id for job_id, job in ExportJobs._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - ExportJobs.MAX_FINISHED)]:
+            del ExportJobs._jobs[job_id]
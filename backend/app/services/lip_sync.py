@@ -0,0 +1,91 @@
+import json
+import os
+import uuid
+import wave
+import numpy as np
+from app.services.pcm import decode_pcm
+
+
+class LipSync:
+    """Derive per-video-frame mouth shapes from the energy of a narration WAV"""
+
+    # Upper energy bound (relative to the loud speech level) for each MouthShapes key
+    ENERGY_LEVELS = (0.08, 0.25, 0.45, 0.7, 0.9)
+    SHAPES = ('rest', 'narrow', 'smile', 'open', 'wide', 'oh')
+
+    # Bump when the analysis changes so stale sidecar files are recomputed
+    ANALYSIS_VERSION = 1
+
+    @staticmethod
+    def read_samples(wav_path: str):
+        """Read a WAV file as a mono float array in [-1, 1] plus its sample rate"""
+        with wave.open(wav_path, 'rb') as wav_file:
+            channels = wav_file.getnchannels()
+            width = wav_file.getsampwidth()
+            sample_rate = wav_file.getframerate()
+            raw = wav_file.readframes(wav_file.getnframes())
+        return decode_pcm(raw, width, channels), sample_rate
+
+    @staticmethod
+    def compute_envelope(samples, sample_rate: int, frame_rate: int = 30):
+        """Return the RMS energy of each video frame, normalized to [0, 1]"""
+        samples_per_frame = max(1, int(round(sample_rate / frame_rate)))
+        frame_count = -(-len(samples) // samples_per_frame)
+        if frame_count == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        padded = np.zeros(frame_count * samples_per_frame, dtype=np.float32)
+        padded[:len(samples)] = samples
+        rms = np.sqrt(np.mean(np.square(padded.reshape(frame_count, samples_per_frame)), axis=1))
+
+        # Normalize against loud speech rather than the single loudest frame
+        reference = np.percentile(rms, 95)
+        if reference <= 1e-6:
+            return np.zeros(frame_count, dtype=np.float32)
+        return np.clip(rms / reference, 0.0, 1.0)
+
+    @staticmethod
+    def envelope_to_shapes(envelope) -> list:
+        """Map normalized energies onto MouthShapes keys"""
+        indexes = np.digitize(envelope, LipSync.ENERGY_LEVELS)
+        return np.asarray(LipSync.SHAPES)[indexes].tolist()
+
+    @staticmethod
+    def analyze(wav_path: str, frame_rate: int = 30) -> dict:
+        """Analyze a WAV file into per-frame mouth shapes and energies"""
+        samples, sample_rate = LipSync.read_samples(wav_path)
+        envelope = LipSync.compute_envelope(samples, sample_rate, frame_rate)
+        return {
+            'frame_rate': frame_rate,
+            'shapes': LipSync.envelope_to_shapes(envelope),
+            'energy': np.round(envelope.astype(np.float64), 3).tolist()
+        }
+
+    @staticmethod
+    def get(wav_path: str, frame_rate: int = 30) -> dict:
+        """Return the lip-sync data for a WAV file, computing it only when the sidecar is stale"""
+        # Audio files are only ever replaced by rename, which gives them a new
+        # inode. mtime is not used because TTS cache hits touch hard-linked files.
+        stat = os.stat(wav_path)
+        signature = [LipSync.ANALYSIS_VERSION, stat.st_ino, stat.st_size, frame_rate]
+        sidecar_path = f'{wav_path}.lipsync.json'
+
+        try:
+            with open(sidecar_path) as f:
+                cached = json.load(f)
+            if cached.get('signature') == signature:
+                return cached
+        except (OSError, ValueError):
+            pass
+
+        result = LipSync.analyze(wav_path, frame_rate)
+        result['signature'] = signature
+
+        tmp_path = f'{sidecar_path}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, sidecar_path)
+        except OSError as e:
+            print(f"Error caching lip-sync data: {e}")
+        return result
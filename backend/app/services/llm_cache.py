@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import time
+import unicodedata
+import uuid
+from app.services.disk_cache import ContentAddressedCache
+
+
+class LLMResponseCache(ContentAddressedCache):
+    """Disk-backed cache of parsed LLM responses.
+
+    Entries live under <cache_dir>/<key[:2]>/<key>.json, keyed by the
+    normalized prompt, the model name and the prompt template version.
+    Entries older than ttl seconds are treated as misses, and the least
+    recently used entries are deleted once the cache grows past max_bytes.
+    """
+
+    EXTENSION = '.json'
+
+    def __init__(self, cache_dir: str, ttl: float = None, max_bytes: int = None):
+        super().__init__(cache_dir, max_bytes if max_bytes is not None
+                         else int(os.getenv('LLM_CACHE_MAX_BYTES', 64 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else float(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Normalize a prompt so trivially different strings share an entry"""
+        return ' '.join(unicodedata.normalize('NFC', prompt or '').split())
+
+    def key(self, prompt: str, model: str, template_version) -> str:
+        parts = [model, str(template_version), LLMResponseCache.normalize_prompt(prompt)]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached response for key, or None on a miss"""
+        path = self.path_for(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+
+        if time.time() - entry.get('created_at', 0) > self.ttl:
+            self._count('expired')
+            self._count('misses')
+            self._remove(path)
+            return None
+
+        try:
+            # Reads refresh the LRU position; created_at still governs the TTL
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        return entry.get('response')
+
+    def put(self, key: str, response, **metadata):
+        """Store a response, replacing any existing entry atomically"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = dict(metadata, created_at=time.time(), response=response)
+
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        self._replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['bytes'] = self._total_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['ttl'] = self.ttl
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
@@ -0,0 +1,404 @@
+import itertools
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class LLMError(Exception):
+    """Base class for failures calling the story LLM"""
+
+
+class LLMConfigurationError(LLMError):
+    """The backend cannot be called at all (e.g. no API key); never retried"""
+
+
+class LLMTimeoutError(LLMError):
+    """A call did not finish before its deadline"""
+
+
+class CircuitOpenError(LLMError):
+    """The circuit breaker is rejecting calls after recent failures"""
+
+
+class CircuitBreaker:
+    """Stop calling a failing dependency for a while.
+
+    closed: calls pass; failure_threshold consecutive failures open the circuit.
+    open: calls are rejected until reset_timeout has elapsed.
+    half_open: one probe call is let through; success closes the circuit,
+    failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None):
+        self.failure_threshold = failure_threshold if failure_threshold is not None else int(os.getenv('LLM_BREAKER_FAILURES', 5))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(os.getenv('LLM_BREAKER_RESET', 30))
+        self._lock = threading.Lock()
+        self._state = CircuitBreaker.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._transitions = {}
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Return whether a call may proceed now"""
+        with self._lock:
+            if self._state == CircuitBreaker.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._rejected += 1
+                    return False
+                self._transition(CircuitBreaker.HALF_OPEN)
+            if self._state == CircuitBreaker.HALF_OPEN:
+                if self._probing:
+                    self._rejected += 1
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._state != CircuitBreaker.CLOSED:
+                self._transition(CircuitBreaker.CLOSED)
+
+    def release(self):
+        """End a call that says nothing about the dependency's health"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == CircuitBreaker.HALF_OPEN or (
+                    self._state == CircuitBreaker.CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(CircuitBreaker.OPEN)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'rejected': self._rejected,
+                'transitions': dict(self._transitions)
+            }
+
+    def _transition(self, state: str):
+        name = f'{self._state}->{state}'
+        self._transitions[name] = self._transitions.get(name, 0) + 1
+        print(f"LLM circuit breaker: {name}")
+        self._state = state
+
+
+class GeminiClient:
+    """Google Gemini text generation"""
+
+    def __init__(self, model: str = 'gemini-2.5-flash'):
+        self.model = model
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self._model().generate_content(prompt, request_options={'timeout': timeout})
+        return response.text.strip()
+
+    def generate_stream(self, prompt: str, timeout: float):
+        """Yield the response text in chunks as Gemini produces it"""
+        for chunk in self._model().generate_content(prompt, stream=True, request_options={'timeout': timeout}):
+            yield chunk.text
+
+    def warm_up(self):
+        """Import and configure the SDK ahead of the first request"""
+        if os.getenv('GOOGLE_API_KEY'):
+            self._model()
+
+    def _model(self):
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            raise LLMConfigurationError('GOOGLE_API_KEY not set in environment')
+
+        # Imported on first use: the SDK dominates the app's cold-start time
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(self.model)
+
+
+class StubLLMClient:
+    """Offline stand-in for the LLM, with fault injection for testing.
+
+    LLM_STUB_MODE selects the behaviour: 'ok' (default), 'fail' (raise),
+    'hang' (sleep past any deadline), 'flaky' (fail LLM_STUB_FAILURE_RATE of
+    calls), 'garbage' (return text that is not JSON) or 'replay' (return the
+    recorded responses in the LLM_STUB_REPLAY JSON file in turn).
+    LLM_STUB_LATENCY adds a delay in seconds to every call, plus up to
+    LLM_STUB_LATENCY_JITTER more, and streamed responses arrive in pieces
+    LLM_STUB_CHUNK_DELAY seconds apart.
+    """
+
+    model = 'stub'
+
+    BACKGROUNDS = ('forest', 'mountain', 'village', 'castle', 'ocean', 'garden')
+
+    def __init__(self, mode: str = None, latency: float = None, failure_rate: float = None):
+        self.mode = mode or os.getenv('LLM_STUB_MODE', 'ok')
+        self.latency = latency if latency is not None else float(os.getenv('LLM_STUB_LATENCY', 0))
+        self.failure_rate = failure_rate if failure_rate is not None else float(os.getenv('LLM_STUB_FAILURE_RATE', 0.5))
+        self.chunk_delay = float(os.getenv('LLM_STUB_CHUNK_DELAY', 0.05))
+        self.latency_jitter = float(os.getenv('LLM_STUB_LATENCY_JITTER', 0))
+        self._replay = None
+        self._replay_count = itertools.count()
+        if self.mode == 'replay':
+            self._replay = StubLLMClient.load_recordings(os.getenv('LLM_STUB_REPLAY', ''))
+
+    @staticmethod
+    def load_recordings(path: str) -> list:
+        """Read recorded responses: a JSON list of story objects or raw response strings"""
+        with open(path) as f:
+            recordings = json.load(f)
+        if isinstance(recordings, dict):
+            recordings = [recordings]
+        if not recordings:
+            raise ValueError(f'No recorded responses in {path}')
+        return [text if isinstance(text, str) else json.dumps(text) for text in recordings]
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        if self.latency or self.latency_jitter:
+            time.sleep(self.latency + random.uniform(0, self.latency_jitter))
+        if self.mode == 'hang':
+            time.sleep(timeout + 1)
+        if self.mode == 'fail' or (self.mode == 'flaky' and random.random() < self.failure_rate):
+            raise ConnectionError('Injected LLM failure')
+        if self.mode == 'garbage':
+            return 'Once upon a time there was no JSON.'
+        if self._replay:
+            return self._replay[next(self._replay_count) % len(self._replay)]
+
+        match = re.search(r'based on this prompt: (.*)', prompt)
+        subject = match.group(1).strip() if match else 'a small adventure'
+        scenes = []
+        for idx, (beat, characters) in enumerate([
+            ('begins', ['hero', 'friend']),
+            ('faces a challenge', ['hero', 'friend', 'villain']),
+            ('ends happily', ['hero', 'friend'])
+        ], 1):
+            scenes.append({
+                'title': f'Scene {idx}',
+                'background': StubLLMClient.BACKGROUNDS[(idx - 1) % len(StubLLMClient.BACKGROUNDS)],
+                'characters': characters,
+                'narration': f'The story of {subject} {beat}. Everyone learns something new along the way.'
+            })
+        return json.dumps({'title': subject[:50].title() or 'Generated Adventure', 'scenes': scenes})
+
+    def warm_up(self):
+        pass
+
+    def generate_stream(self, prompt: str, timeout: float):
+        text = self.generate(prompt, timeout)
+        for start in range(0, len(text), 64):
+            if start:
+                time.sleep(self.chunk_delay)
+            yield text[start:start + 64]
+
+
+class ResilientLLM:
+    """Wrap an LLM backend with a hard deadline, jittered retries and a circuit breaker"""
+
+    # Error class names (from google.api_core) that retrying cannot fix
+    PERMANENT_ERRORS = ('InvalidArgument', 'PermissionDenied', 'Unauthenticated', 'NotFound', 'FailedPrecondition')
+
+    def __init__(self, backend, deadline: float = None, attempt_timeout: float = None,
+                 retries: int = None, backoff: float = None, breaker: CircuitBreaker = None):
+        self.backend = backend
+        self.deadline = deadline if deadline is not None else float(os.getenv('LLM_DEADLINE', 20))
+        self.attempt_timeout = attempt_timeout if attempt_timeout is not None else float(os.getenv('LLM_TIMEOUT', 10))
+        self.retries = retries if retries is not None else int(os.getenv('LLM_RETRIES', 2))
+        self.backoff = backoff if backoff is not None else float(os.getenv('LLM_BACKOFF', 0.5))
+        self.breaker = breaker or CircuitBreaker()
+        self.stream_deadline = float(os.getenv('LLM_STREAM_DEADLINE', 60))
+
+        # Calls run on worker threads so a hung client cannot outlive its deadline
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+            thread_name_prefix='llm-call'
+        )
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0, 'timeouts': 0, 'short_circuited': 0}
+
+    @property
+    def model(self) -> str:
+        return self.backend.model
+
+    def generate(self, prompt: str) -> str:
+        """Return the backend's response text, or raise LLMError within the deadline"""
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError('LLM circuit is open; skipping call')
+
+        give_up_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = give_up_at - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise LLMTimeoutError(f'LLM deadline of {self.deadline}s exceeded')
+                text = self._attempt(prompt, min(self.attempt_timeout, remaining))
+            except LLMConfigurationError:
+                # Not the dependency's fault; leave the breaker state alone
+                self.breaker.release()
+                self._count('failures')
+                raise
+            except Exception as e:
+                attempt += 1
+                delay = random.uniform(0, self.backoff * (2 ** (attempt - 1)))
+                if (attempt > self.retries or not self._is_retryable(e)
+                        or time.monotonic() + delay >= give_up_at):
+                    self.breaker.record_failure()
+                    self._count('failures')
+                    if isinstance(e, LLMError):
+                        raise
+                    raise LLMError(f'{type(e).__name__}: {e}') from e
+                self._count('retries')
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self._count('successes')
+            return text
+
+    def stream(self, prompt: str):
+        """Yield the backend's response text in chunks.
+
+        Each chunk must arrive within the per-attempt timeout and the whole
+        response within LLM_STREAM_DEADLINE. Failures are retried only until
+        the first chunk arrives; after that they are raised to the caller.
+        """
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError('LLM circuit is open; skipping call')
+
+        give_up_at = time.monotonic() + self.stream_deadline
+        attempt = 0
+        while True:
+            chunks = queue.Queue()
+            cancelled = threading.Event()
+            received = False
+            try:
+                self._executor.submit(self._produce, prompt, chunks, cancelled)
+                while True:
+                    wait = min(self.attempt_timeout, give_up_at - time.monotonic())
+                    if wait <= 0:
+                        raise LLMTimeoutError(f'LLM stream deadline of {self.stream_deadline}s exceeded')
+                    try:
+                        kind, value = chunks.get(timeout=wait)
+                    except queue.Empty:
+                        self._count('timeouts')
+                        raise LLMTimeoutError(f'No LLM output for {wait:.1f}s')
+                    if kind == 'end':
+                        break
+                    if kind == 'error':
+                        raise value
+                    received = True
+                    yield value
+            except LLMConfigurationError:
+                self.breaker.release()
+                self._count('failures')
+                raise
+            except GeneratorExit:
+                # The consumer stopped reading; that says nothing about the backend
+                cancelled.set()
+                self.breaker.release()
+                raise
+            except Exception as e:
+                cancelled.set()
+                attempt += 1
+                delay = random.uniform(0, self.backoff * (2 ** (attempt - 1)))
+                if (received or attempt > self.retries or not self._is_retryable(e)
+                        or time.monotonic() + delay >= give_up_at):
+                    self.breaker.record_failure()
+                    self._count('failures')
+                    if isinstance(e, LLMError):
+                        raise
+                    raise LLMError(f'{type(e).__name__}: {e}') from e
+                self._count('retries')
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self._count('successes')
+            return
+
+    def warm_up(self):
+        """Prepare the backend so the first real call does not pay its setup cost"""
+        self.backend.warm_up()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['backend'] = self.model
+        stats['breaker'] = self.breaker.stats()
+        return stats
+
+    def _attempt(self, prompt: str, timeout: float) -> str:
+        future = self._executor.submit(self.backend.generate, prompt, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._count('timeouts')
+            raise LLMTimeoutError(f'LLM call exceeded {timeout:.1f}s')
+
+    def _produce(self, prompt: str, chunks: queue.Queue, cancelled: threading.Event):
+        """Worker thread: pump the backend's stream into chunks until cancelled"""
+        try:
+            for text in self.backend.generate_stream(prompt, self.attempt_timeout):
+                if cancelled.is_set():
+                    return
+                if text:
+                    chunks.put(('chunk', text))
+            chunks.put(('end', None))
+        except Exception as e:
+            chunks.put(('error', e))
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (LLMConfigurationError, CircuitOpenError)):
+            return False
+        return type(error).__name__ not in ResilientLLM.PERMANENT_ERRORS
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> ResilientLLM:
+    """Return the process-wide LLM client selected by LLM_BACKEND ('gemini' or 'stub')"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            backend_name = os.getenv('LLM_BACKEND', 'gemini').lower()
+            if backend_name == 'stub':
+                backend = StubLLMClient()
+            else:
+                backend = GeminiClient(os.getenv('GEMINI_MODEL', 'gemini-2.5-flash'))
+            _client = ResilientLLM(backend)
+        return _client
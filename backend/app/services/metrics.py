@@ -0,0 +1,172 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+METRICS_ENABLED = os.getenv('METRICS', '1') != '0'
+
+# Upper bounds (seconds) of the latency buckets
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class Histogram:
+    """Latency histogram with fixed bucket bounds"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> list:
+        """Prometheus text lines for this histogram (cumulative buckets)"""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class Metrics:
+    """Process-wide request and pipeline metrics in the Prometheus text format.
+
+    Recording is a dict lookup and a few integer updates under one lock.
+    Under gunicorn every worker keeps its own numbers, so each scrape
+    describes the worker that answered it (labelled by pid).
+    """
+
+    _lock = threading.Lock()
+    _requests = {}
+    _responses = {}
+    _in_flight = {}
+    _stages = {}
+
+    @staticmethod
+    def request_started(route: str):
+        with Metrics._lock:
+            Metrics._in_flight[route] = Metrics._in_flight.get(route, 0) + 1
+
+    @staticmethod
+    def request_finished(route: str, method: str, status: int, seconds: float):
+        with Metrics._lock:
+            histogram = Metrics._requests.get((route, method))
+            if histogram is None:
+                histogram = Metrics._requests[(route, method)] = Histogram(REQUEST_BUCKETS)
+            histogram.observe(seconds)
+            key = (route, method, status)
+            Metrics._responses[key] = Metrics._responses.get(key, 0) + 1
+
+    @staticmethod
+    def request_done(route: str):
+        with Metrics._lock:
+            Metrics._in_flight[route] -= 1
+
+    @staticmethod
+    def observe_stage(stage: str, seconds: float):
+        """Record one run of a pipeline stage (llm, tts, render, rasterize, encode, mux)"""
+        with Metrics._lock:
+            histogram = Metrics._stages.get(stage)
+            if histogram is None:
+                histogram = Metrics._stages[stage] = Histogram(STAGE_BUCKETS)
+            histogram.observe(seconds)
+
+    @staticmethod
+    @contextmanager
+    def stage_timer(stage: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            Metrics.observe_stage(stage, time.perf_counter() - started_at)
+
+    @staticmethod
+    def render() -> str:
+        """Return every metric in the Prometheus text exposition format"""
+        pid = f'pid="{os.getpid()}"'
+        with Metrics._lock:
+            requests = [histogram.lines('http_request_duration_seconds', f'{pid},route="{route}",method="{method}"')
+                        for (route, method), histogram in sorted(Metrics._requests.items())]
+            responses = sorted(Metrics._responses.items())
+            in_flight = sorted(Metrics._in_flight.items())
+            stages = [histogram.lines('stage_duration_seconds', f'{pid},stage="{stage}"')
+                      for stage, histogram in sorted(Metrics._stages.items())]
+
+        lines = [
+            '# HELP http_request_duration_seconds Time to produce the response, by route',
+            '# TYPE http_request_duration_seconds histogram'
+        ]
+        for histogram_lines in requests:
+            lines.extend(histogram_lines)
+
+        lines += ['# HELP http_requests_in_flight Requests being handled, by route',
+                  '# TYPE http_requests_in_flight gauge']
+        lines += [f'http_requests_in_flight{{{pid},route="{route}"}} {count}' for route, count in in_flight]
+
+        lines += ['# HELP http_responses_total Responses by route and status code',
+                  '# TYPE http_responses_total counter']
+        lines += [f'http_responses_total{{{pid},route="{route}",method="{method}",status="{status}"}} {count}'
+                  for (route, method, status), count in responses]
+
+        lines += ['# HELP stage_duration_seconds Duration of LLM, TTS, render, rasterize, encode and mux runs',
+                  '# TYPE stage_duration_seconds histogram']
+        for histogram_lines in stages:
+            lines.extend(histogram_lines)
+
+        lines += Metrics._pipeline_lines(pid)
+        lines += Metrics._cache_lines(pid)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _pipeline_lines(pid: str) -> list:
+        """Story pipeline concurrency gauges and busy time per stage"""
+        from app.services.story_pipeline import StoryPipeline
+
+        stages = StoryPipeline.stats()['stages']
+        lines = []
+        for name, kind, field, help_text in (
+            ('pipeline_stage_active', 'gauge', 'active', 'Story pipeline slots in use'),
+            ('pipeline_stage_waiting', 'gauge', 'waiting', 'Story pipeline callers waiting for a slot'),
+            ('pipeline_stage_completed_total', 'counter', 'completed', 'Story pipeline stage runs'),
+            ('pipeline_stage_wait_seconds_total', 'counter', 'wait_seconds', 'Time spent waiting for a slot'),
+            ('pipeline_stage_busy_seconds_total', 'counter', 'busy_seconds', 'Time spent holding a slot')
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{{{pid},stage="{stage}"}} {stats[field]}' for stage, stats in sorted(stages.items())]
+        return lines
+
+    @staticmethod
+    def _cache_lines(pid: str) -> list:
+        """Hit and miss counters and hit ratio for each cache"""
+        from app.models.scene_cache import SceneCache
+        from app.services.audio_service import AudioService
+        from app.services.story_generator import StoryGenerator
+
+        caches = []
+        for name, stats in (('scene', SceneCache.stats), ('llm', lambda: StoryGenerator.get_cache().stats()),
+                            ('tts', lambda: AudioService.get_cache().stats())):
+            try:
+                caches.append((name, stats()))
+            except Exception as e:
+                print(f"Error reading {name} cache stats: {e}")
+
+        lines = ['# HELP cache_hits_total Cache lookups answered from the cache', '# TYPE cache_hits_total counter']
+        lines += [f'cache_hits_total{{{pid},cache="{name}"}} {stats["hits"]}' for name, stats in caches]
+        lines += ['# HELP cache_misses_total Cache lookups that missed', '# TYPE cache_misses_total counter']
+        lines += [f'cache_misses_total{{{pid},cache="{name}"}} {stats["misses"]}' for name, stats in caches]
+        lines += ['# HELP cache_hit_ratio Hits over lookups since startup', '# TYPE cache_hit_ratio gauge']
+        lines += [f'cache_hit_ratio{{{pid},cache="{name}"}} {stats["hit_rate"]:.4f}' for name, stats in caches]
+        return lines
@@ -0,0 +1,25 @@
+import numpy as np
+
+
+def decode_pcm(raw: bytes, sample_width: int, channels: int):
+    """Decode little-endian PCM frames into a mono float32 array in [-1, 1]"""
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768
+    elif sample_width == 3:
+        # Sign-extend packed 24-bit samples into int32
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        packed = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        samples = np.where(packed & 0x800000, packed - 0x1000000, packed).astype(np.float32) / 8388608
+    else:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648
+
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def encode_pcm16(samples) -> bytes:
+    """Encode float samples in [-1, 1] as 16-bit little-endian PCM"""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
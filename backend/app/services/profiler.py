@@ -0,0 +1,114 @@
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+
+class SamplingProfiler:
+    """Sample one thread's call stack at a fixed interval and count the stacks seen"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+class RequestProfiler:
+    """Profile single requests on demand.
+
+    A request opts in by sending the PROFILE_TOKEN in an X-Profile header or
+    a ?profile= query parameter. Its thread is sampled until the response
+    is closed (streamed bodies included) and the stacks are written in the
+    collapsed format read by flamegraph.pl and speedscope. Without a token
+    configured no hooks are installed at all.
+    """
+
+    TOKEN = os.getenv('PROFILE_TOKEN', '')
+    INTERVAL = float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000
+    MAX_PROFILES = int(os.getenv('PROFILE_MAX_FILES', 200))
+
+    PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'storage', 'profiles')
+
+    PROFILE_ID = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{12}$')
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(RequestProfiler.TOKEN)
+
+    @staticmethod
+    def authorized(token: str) -> bool:
+        return bool(token) and RequestProfiler.enabled() and hmac.compare_digest(token, RequestProfiler.TOKEN)
+
+    @staticmethod
+    def start() -> 'ProfiledRequest':
+        return ProfiledRequest(threading.get_ident())
+
+    @staticmethod
+    def profile_path(profile_id: str) -> str:
+        """Return the file of a stored profile, or None for an unknown or malformed id"""
+        if not RequestProfiler.PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(RequestProfiler.PROFILE_DIR, f'{profile_id}.collapsed')
+        return path if os.path.exists(path) else None
+
+    @staticmethod
+    def save(profile_id: str, samples: Counter):
+        os.makedirs(RequestProfiler.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(RequestProfiler.PROFILE_DIR, f'{profile_id}.collapsed')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        os.replace(tmp_path, path)
+        RequestProfiler._prune()
+
+    @staticmethod
+    def _prune():
+        """Keep only the newest MAX_PROFILES profiles (ids sort by time)"""
+        profiles = sorted(name for name in os.listdir(RequestProfiler.PROFILE_DIR) if name.endswith('.collapsed'))
+        for name in profiles[:max(0, len(profiles) - RequestProfiler.MAX_PROFILES)]:
+            try:
+                os.remove(os.path.join(RequestProfiler.PROFILE_DIR, name))
+            except OSError:
+                pass
+
+
+class ProfiledRequest:
+    """A request being sampled; finish() writes its profile"""
+
+    def __init__(self, thread_id: int):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:12]}"
+        self._profiler = SamplingProfiler(thread_id, RequestProfiler.INTERVAL)
+        self._profiler.start()
+
+    def finish(self):
+        samples = self._profiler.stop()
+        try:
+            RequestProfiler.save(self.id, samples)
+        except OSError as e:
+            print(f"Error saving profile {self.id}: {e}")
@@ -0,0 +1,41 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+class RenderPool:
+    """Process pool that keeps CPU-bound rendering off the async server's event loop.
+
+    Workers are spawned (not forked) so they never inherit the event loop
+    or the server's threads.
+    """
+
+    WORKERS = int(os.getenv('RENDER_WORKERS', os.cpu_count() or 2))
+    START_METHOD = 'spawn'
+
+    _executor = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_executor() -> ProcessPoolExecutor:
+        with RenderPool._lock:
+            if RenderPool._executor is None:
+                RenderPool._executor = ProcessPoolExecutor(
+                    max_workers=RenderPool.WORKERS,
+                    mp_context=multiprocessing.get_context(RenderPool.START_METHOD)
+                )
+            return RenderPool._executor
+
+    @staticmethod
+    async def run(fn, *args):
+        """Await fn(*args) in a worker process; fn and its arguments must be picklable"""
+        return await asyncio.get_running_loop().run_in_executor(RenderPool.get_executor(), fn, *args)
+
+    @staticmethod
+    def shutdown():
+        with RenderPool._lock:
+            if RenderPool._executor is not None:
+                RenderPool._executor.shutdown(wait=False, cancel_futures=True)
+                RenderPool._executor = None
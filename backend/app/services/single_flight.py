@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the work; callers arriving while it is
+    in flight wait for and share its result (or exception). Once the work
+    finishes the key is released, so later calls run again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers with this key and return its result"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def do_async(self, key, start) -> Future:
+        """Like do(), for work that start() launches and returns as a Future"""
+        future, leader = self._join(key)
+        if not leader:
+            return future
+
+        try:
+            work = start()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+
+        def _done(done):
+            error = done.exception()
+            if error is not None:
+                self._finish(key, future, error=error)
+            else:
+                self._finish(key, future, result=done.result())
+
+        work.add_done_callback(_done)
+        return future
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -0,0 +1,124 @@
+import os
+import uuid
+import wave
+import numpy as np
+from app.services.pcm import decode_pcm, encode_pcm16
+
+
+class StreamingResampler:
+    """Linear-interpolation resampler that works chunk by chunk.
+
+    The last input sample and the fractional read position carry over
+    between chunks, so the output is continuous across chunk boundaries.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int):
+        self.step = source_rate / target_rate
+        self.passthrough = source_rate == target_rate
+        self._tail = None
+        self._position = 0.0
+
+    def process(self, samples):
+        if self.passthrough or len(samples) == 0:
+            return samples
+
+        buffer = samples if self._tail is None else np.concatenate((self._tail, samples))
+        last_index = len(buffer) - 1
+        if last_index < self._position:
+            count = 0
+        else:
+            count = int((last_index - self._position) // self.step) + 1
+
+        positions = self._position + np.arange(count) * self.step
+        left = np.floor(positions).astype(np.int64)
+        right = np.minimum(left + 1, last_index)
+        fraction = (positions - left).astype(np.float32)
+        output = buffer[left] * (1 - fraction) + buffer[right] * fraction
+
+        self._tail = buffer[-1:]
+        self._position = self._position + count * self.step - last_index
+        return output
+
+
+class SoundtrackBuilder:
+    """Assemble per-scene narration WAVs into one PCM track aligned to scene timing"""
+
+    SAMPLE_RATE = 22050
+    CHUNK_FRAMES = 16384
+
+    @staticmethod
+    def build(segments, output_path: str, sample_rate: int = None) -> dict:
+        """Write a 16-bit mono WAV from (wav_path or None, duration) segments.
+
+        Each segment starts at the sum of the previous durations. Its audio is
+        streamed in chunks, resampled to sample_rate, trimmed to the segment
+        duration and padded with silence, so no input file is ever fully
+        loaded into memory.
+        """
+        sample_rate = sample_rate or SoundtrackBuilder.SAMPLE_RATE
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        tmp_path = f'{output_path}.{uuid.uuid4().hex}.tmp'
+
+        elapsed = 0.0
+        written = 0
+        with_audio = 0
+        try:
+            with wave.open(tmp_path, 'wb') as out:
+                out.setnchannels(1)
+                out.setsampwidth(2)
+                out.setframerate(sample_rate)
+
+                for wav_path, duration in segments:
+                    # Place boundaries from cumulative time so rounding never drifts
+                    elapsed += duration
+                    segment_end = int(round(elapsed * sample_rate))
+                    remaining = segment_end - written
+
+                    if wav_path and os.path.exists(wav_path):
+                        with_audio += 1
+                        for chunk in SoundtrackBuilder._stream_wav(wav_path, sample_rate):
+                            if remaining <= 0:
+                                break
+                            chunk = chunk[:remaining]
+                            out.writeframes(encode_pcm16(chunk))
+                            remaining -= len(chunk)
+                            written += len(chunk)
+
+                    if remaining > 0:
+                        SoundtrackBuilder._write_silence(out, remaining)
+                        written += remaining
+
+            os.replace(tmp_path, output_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return {
+            'output_path': output_path,
+            'duration': written / sample_rate,
+            'segments_with_audio': with_audio
+        }
+
+    @staticmethod
+    def _stream_wav(wav_path: str, sample_rate: int):
+        """Yield a WAV file as mono float chunks at sample_rate"""
+        with wave.open(wav_path, 'rb') as wav_file:
+            channels = wav_file.getnchannels()
+            width = wav_file.getsampwidth()
+            resampler = StreamingResampler(wav_file.getframerate(), sample_rate)
+            while True:
+                raw = wav_file.readframes(SoundtrackBuilder.CHUNK_FRAMES)
+                if not raw:
+                    break
+                chunk = resampler.process(decode_pcm(raw, width, channels))
+                if len(chunk):
+                    yield chunk
+
+    @staticmethod
+    def _write_silence(out, frames: int):
+        silence = bytes(2 * min(frames, SoundtrackBuilder.CHUNK_FRAMES))
+        while frames > 0:
+            count = min(frames, SoundtrackBuilder.CHUNK_FRAMES)
+            out.writeframes(silence[:2 * count])
+            frames -= count
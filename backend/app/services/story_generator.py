@@ -3,7 +3,10 @@ import uuid
 from datetime import datetime
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_client import get_llm_client, LLMError
+from app.services.story_stream import SceneStreamParser
+from app.services.metrics import Metrics
 
 # Load environment variables
 load_dotenv()
@@ -49,27 +52,139 @@ class StoryGenerator:
         'garden': {'color': '#98FB98', 'elements': ['flowers', 'paths', 'sky']}
     }
     
+    # Bump whenever _build_prompt changes so cached responses are not reused
+    PROMPT_TEMPLATE_VERSION = 1
+    
+    LLM_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'storage', 'llm_cache')
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') != '0'
+    _cache = None
+    
+    @staticmethod
+    def get_cache() -> LLMResponseCache:
+        """Return the disk cache of parsed LLM responses"""
+        if StoryGenerator._cache is None:
+            StoryGenerator._cache = LLMResponseCache(StoryGenerator.LLM_CACHE_DIR)
+        return StoryGenerator._cache
+    
     @staticmethod
-    def generate_from_prompt(prompt: str) -> dict:
-        """Generate a story structure from a text prompt using Google Gemini AI"""
+    def generate_from_prompt(prompt: str, use_cache: bool = True) -> dict:
+        """Generate a story structure from a text prompt using the configured LLM
+        
+        Parsed responses are cached on disk, so repeating a prompt skips the
+        LLM call. Pass use_cache=False to force a fresh generation (the new
+        response still replaces the cached one).
+        """
         story_id = str(uuid.uuid4())
         
         try:
-            # Get Google API key from environment
-            api_key = os.getenv('GOOGLE_API_KEY')
-            print(f"DEBUG: API Key set: {bool(api_key)}")
-            print(f"DEBUG: API Key (first 20 chars): {api_key[:20] if api_key else 'None'}")
+            use_cache = use_cache and StoryGenerator.LLM_CACHE_ENABLED
+            client = get_llm_client()
+            cache = StoryGenerator.get_cache()
+            key = cache.key(prompt, client.model, StoryGenerator.PROMPT_TEMPLATE_VERSION)
             
-            if not api_key:
-                raise ValueError('GOOGLE_API_KEY not set in environment')
+            story_json = cache.get(key) if use_cache else None
+            if story_json is not None:
+                print(f"DEBUG: Using cached story for prompt: {prompt[:50]}...")
+            else:
+                story_content = StoryGenerator._call(StoryGenerator._build_prompt(prompt))
+                story_json = StoryGenerator._parse(story_content)
+                try:
+                    cache.put(key, story_json, model=client.model,
+                              template_version=StoryGenerator.PROMPT_TEMPLATE_VERSION)
+                except OSError as e:
+                    print(f"Error caching story response: {e}")
             
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.5-flash')
+            print(f"DEBUG: Story generated successfully with {client.model}")
+            return StoryGenerator._build_story(story_json, story_id)
             
-            print(f"DEBUG: Calling Gemini with prompt: {prompt[:50]}...")
+        except LLMError as e:
+            # Expected outages (timeouts, open circuit, no API key) need no traceback
+            print(f"ERROR generating story with LLM: {type(e).__name__}: {e}")
+            print(f"DEBUG: Using fallback story generation")
+            return StoryGenerator._generate_fallback_story(prompt, story_id)
+        except Exception as e:
+            print(f"ERROR generating story with LLM: {type(e).__name__}: {e}")
+            import traceback
+            traceback.print_exc()
+            print(f"DEBUG: Using fallback story generation")
+            return StoryGenerator._generate_fallback_story(prompt, story_id)
+    
+    @staticmethod
+    def stream_from_prompt(prompt: str, use_cache: bool = True):
+        """Generate a story incrementally, yielding (event, value) pairs
+        
+        Events are ('title', title) once the title is known, ('scene', scene)
+        as soon as each scene has been received in full, and finally
+        ('done', info) where info says whether the fallback generator was
+        used and whether the story is complete. A story that fails before
+        its first scene falls back to the template; one that fails part way
+        ends with complete=False.
+        """
+        try:
+            use_cache = use_cache and StoryGenerator.LLM_CACHE_ENABLED
+            client = get_llm_client()
+            cache = StoryGenerator.get_cache()
+            key = cache.key(prompt, client.model, StoryGenerator.PROMPT_TEMPLATE_VERSION)
+            story_json = cache.get(key) if use_cache else None
+        except Exception as e:
+            print(f"Error reading story cache: {e}")
+            story_json = None
+        
+        if story_json is not None:
+            print(f"DEBUG: Using cached story for prompt: {prompt[:50]}...")
+            yield 'title', story_json.get('title', 'Generated Adventure')
+            for idx, scene_data in enumerate(story_json.get('scenes', []), 1):
+                yield 'scene', StoryGenerator._build_scene(scene_data, idx)
+            yield 'done', {'fallback': False, 'complete': True, 'cached': True}
+            return
+        
+        # Imported here because story_pipeline imports this module
+        from app.services.story_pipeline import StoryPipeline
+        
+        parser = SceneStreamParser()
+        chunks = []
+        scene_count = 0
+        title_sent = False
+        try:
+            # Hold an 'llm' slot, as create does, until the response has been read
+            with StoryPipeline.stage('llm'), Metrics.stage_timer('llm'):
+                for chunk in client.stream(StoryGenerator._build_prompt(prompt)):
+                    chunks.append(chunk)
+                    completed = parser.feed(chunk)
+                    if parser.title is not None and not title_sent:
+                        title_sent = True
+                        yield 'title', parser.title
+                    for scene_data in completed:
+                        scene_count += 1
+                        yield 'scene', StoryGenerator._build_scene(scene_data, scene_count)
             
-            # Generate narration for 3 scenes using Gemini
-            response = model.generate_content(f"""Create a children's story with 3 scenes based on this prompt: {prompt}
+            story_json = StoryGenerator._parse(''.join(chunks).strip())
+            try:
+                cache.put(key, story_json, model=client.model,
+                          template_version=StoryGenerator.PROMPT_TEMPLATE_VERSION)
+            except OSError as e:
+                print(f"Error caching story response: {e}")
+            if not title_sent:
+                yield 'title', story_json.get('title', 'Generated Adventure')
+            yield 'done', {'fallback': False, 'complete': True, 'cached': False}
+            return
+        except Exception as e:
+            print(f"ERROR streaming story from LLM: {type(e).__name__}: {e}")
+            if scene_count:
+                yield 'done', {'fallback': False, 'complete': False, 'cached': False, 'error': str(e)}
+                return
+        
+        print(f"DEBUG: Using fallback story generation")
+        story = StoryGenerator._generate_fallback_story(prompt, str(uuid.uuid4()))
+        yield 'title', story['title']
+        for scene in story['scenes']:
+            yield 'scene', scene
+        yield 'done', {'fallback': True, 'complete': True, 'cached': False}
+    
+    @staticmethod
+    def _build_prompt(prompt: str) -> str:
+        """Build the LLM instruction for a user prompt"""
+        return f"""Create a children's story with 3 scenes based on this prompt: {prompt}
 
 Return ONLY a JSON object (no other text) with this exact structure:
 {{
@@ -97,172 +212,91 @@ Return ONLY a JSON object (no other text) with this exact structure:
 }}
 
 Make the story engaging for children. Each scene's narration should relate to and build upon the prompt: {prompt}
-The narration should be different for each scene and directly connected to the story prompt.""")
-            
-            print(f"DEBUG: Gemini response received")
-            story_content = response.text.strip()
-            print(f"DEBUG: Response (first 100 chars): {story_content[:100]}")
-            
-            # Clean up markdown code blocks if present
-            if story_content.startswith('```'):
-                story_content = story_content.split('```')[1]
-                if story_content.startswith('json'):
-                    story_content = story_content[4:]
-            if story_content.endswith('```'):
-                story_content = story_content[:-3]
-            
-            story_json = json.loads(story_content.strip())
-            print(f"DEBUG: JSON parsed successfully")
-            
-            scenes = []
-            for idx, scene_data in enumerate(story_json.get('scenes', []), 1):
-                characters_list = []
-                char_names = scene_data.get('characters', [])
-                
-                # Position characters across the scene
-                positions = [
-                    {'x': 0.2, 'y': 0.7},
-                    {'x': 0.5, 'y': 0.7},
-                    {'x': 0.8, 'y': 0.7},
-                    {'x': 0.35, 'y': 0.6}
-                ]
-                
-                for pos_idx, char_name in enumerate(char_names):
-                    if char_name in StoryGenerator.CHARACTERS:
-                        characters_list.append({
-                            'character_id': char_name,
-                            'position': positions[min(pos_idx, len(positions) - 1)],
-                            'expression': 'happy'
-                        })
-                
-                scene = {
-                    'id': str(uuid.uuid4()),
-                    'sequence': idx,
-                    'title': scene_data.get('title', f'Scene {idx}'),
-                    'background': scene_data.get('background', 'forest'),
-                    'characters': characters_list,
-                    'narration': scene_data.get('narration', ''),
-                    'duration': 4.0,
-                    'animations': [
-                        {
-                            'type': 'entrance',
-                            'character_id': characters_list[0]['character_id'] if characters_list else 'hero',
-                            'duration': 1.0
-                        }
-                    ]
-                }
-                scenes.append(scene)
-            
-            print(f"DEBUG: Story generated successfully with Gemini")
-            return {
-                'story_id': story_id,
-                'title': story_json.get('title', 'Generated Adventure'),
-                'scenes': scenes
-            }
-            
-        except Exception as e:
-            print(f"ERROR generating story with Gemini: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
-            print(f"DEBUG: Using fallback story generation")
-            return StoryGenerator._generate_fallback_story(prompt, story_id)
-            
-            response = client.chat.completions.create(
-                model="gemma2-9b-it",
-                max_tokens=2048,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"""Create a children's story with 3 scenes based on this prompt: {prompt}
-                        
-Return ONLY a JSON object (no other text) with this exact structure:
-{{
-  "title": "Story Title",
-  "scenes": [
-    {{
-      "title": "Scene 1 Title",
-      "background": "forest|castle|village|mountain|ocean|garden",
-      "characters": ["hero", "friend", "villain", "wise_one"],
-      "narration": "2-3 sentences of narration for this scene"
-    }},
-    {{
-      "title": "Scene 2 Title",
-      "background": "mountain|ocean|village|forest|castle|garden",
-      "characters": ["hero", "friend"],
-      "narration": "2-3 sentences of narration for this scene"
-    }},
-    {{
-      "title": "Scene 3 Title",
-      "background": "village|castle|garden|forest|mountain|ocean",
-      "characters": ["hero"],
-      "narration": "2-3 sentences of narration for this scene"
-    }}
-  ]
-}}
-
-Make it engaging for children, with clear story progression and 2-3 sentences per scene narration."""
-                    }
-                ]
-            )
-            
-            story_content = response.choices[0].message.content.strip()
-            
-            if story_content.startswith('```'):
-                story_content = story_content.split('```')[1]
-                if story_content.startswith('json'):
-                    story_content = story_content[4:]
-            if story_content.endswith('```'):
-                story_content = story_content[:-3]
-            
-            story_json = json.loads(story_content.strip())
-            
-            scenes = []
-            for idx, scene_data in enumerate(story_json.get('scenes', []), 1):
-                characters_list = []
-                char_names = scene_data.get('characters', [])
-                
-                positions = [
-                    {'x': 0.2, 'y': 0.7},
-                    {'x': 0.5, 'y': 0.7},
-                    {'x': 0.8, 'y': 0.7},
-                    {'x': 0.35, 'y': 0.6}
-                ]
-                
-                for pos_idx, char_name in enumerate(char_names):
-                    if char_name in StoryGenerator.CHARACTERS:
-                        characters_list.append({
-                            'character_id': char_name,
-                            'position': positions[min(pos_idx, len(positions) - 1)],
-                            'expression': 'happy'
-                        })
-                
-                scene = {
-                    'id': str(uuid.uuid4()),
-                    'sequence': idx,
-                    'title': scene_data.get('title', f'Scene {idx}'),
-                    'background': scene_data.get('background', 'forest'),
-                    'characters': characters_list,
-                    'narration': scene_data.get('narration', ''),
-                    'duration': 4.0,
-                    'animations': [
-                        {
-                            'type': 'entrance',
-                            'character_id': characters_list[0]['character_id'] if characters_list else 'hero',
-                            'duration': 1.0
-                        }
-                    ]
+The narration should be different for each scene and directly connected to the story prompt."""
+    
+    @staticmethod
+    def _call(llm_prompt: str) -> str:
+        """Send the instruction to the LLM and return the raw response text
+        
+        Raises LLMError when the call fails, times out or the circuit is open.
+        """
+        print(f"DEBUG: Calling LLM")
+        with Metrics.stage_timer('llm'):
+            story_content = get_llm_client().generate(llm_prompt)
+        print(f"DEBUG: LLM response received")
+        return story_content
+    
+    @staticmethod
+    def _parse(story_content: str) -> dict:
+        """Extract the story JSON from a response, tolerating markdown fences"""
+        print(f"DEBUG: Response (first 100 chars): {story_content[:100]}")
+        
+        # Clean up markdown code blocks if present
+        if story_content.startswith('```'):
+            story_content = story_content.split('```')[1]
+            if story_content.startswith('json'):
+                story_content = story_content[4:]
+        if story_content.endswith('```'):
+            story_content = story_content[:-3]
+        
+        story_json = json.loads(story_content.strip())
+        if not isinstance(story_json, dict) or not story_json.get('scenes'):
+            raise ValueError('Response has no scenes')
+        print(f"DEBUG: JSON parsed successfully")
+        return story_json
+    
+    @staticmethod
+    def _build_story(story_json: dict, story_id: str) -> dict:
+        """Turn parsed story JSON into scenes with positioned characters"""
+        scenes = [
+            StoryGenerator._build_scene(scene_data, idx)
+            for idx, scene_data in enumerate(story_json.get('scenes', []), 1)
+        ]
+        
+        return {
+            'story_id': story_id,
+            'title': story_json.get('title', 'Generated Adventure'),
+            'scenes': scenes
+        }
+    
+    @staticmethod
+    def _build_scene(scene_data: dict, idx: int) -> dict:
+        """Turn one parsed scene into a scene with positioned characters"""
+        characters_list = []
+        char_names = scene_data.get('characters', [])
+        
+        # Position characters across the scene
+        positions = [
+            {'x': 0.2, 'y': 0.7},
+            {'x': 0.5, 'y': 0.7},
+            {'x': 0.8, 'y': 0.7},
+            {'x': 0.35, 'y': 0.6}
+        ]
+        
+        for pos_idx, char_name in enumerate(char_names):
+            if char_name in StoryGenerator.CHARACTERS:
+                characters_list.append({
+                    'character_id': char_name,
+                    'position': positions[min(pos_idx, len(positions) - 1)],
+                    'expression': 'happy'
+                })
+        
+        return {
+            'id': str(uuid.uuid4()),
+            'sequence': idx,
+            'title': scene_data.get('title', f'Scene {idx}'),
+            'background': scene_data.get('background', 'forest'),
+            'characters': characters_list,
+            'narration': scene_data.get('narration', ''),
+            'duration': 4.0,
+            'animations': [
+                {
+                    'type': 'entrance',
+                    'character_id': characters_list[0]['character_id'] if characters_list else 'hero',
+                    'duration': 1.0
                 }
-                scenes.append(scene)
-            
-            return {
-                'story_id': story_id,
-                'title': story_json.get('title', 'Generated Adventure'),
-                'scenes': scenes
-            }
-            
-        except Exception as e:
-            print(f"Error generating story with Groq: {e}")
-            return StoryGenerator._generate_fallback_story(prompt, story_id)
+            ]
+        }
     
     @staticmethod
     def _generate_fallback_story(prompt: str, story_id: str) -> dict:
@@ -0,0 +1,284 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent import futures
+from contextlib import contextmanager
+from datetime import datetime
+from app.models.database import execute_db, execute_many_db
+from app.models.scene_cache import SceneCache
+from app.services.story_generator import StoryGenerator
+from app.services.audio_service import AudioService
+
+
+class StoryPipeline:
+    """Create stories end to end: LLM generation, scene storage and narration.
+
+    Each stage is gated by a process-wide semaphore, so concurrent requests
+    and batch items share fixed LLM, TTS and database concurrency limits.
+    SQLite allows a single writer, so the DB stage defaults to one slot.
+    """
+
+    # Seconds a story waits for scene audio before answering with audio_ready: false
+    AUDIO_TIMEOUT = float(os.getenv('STORY_AUDIO_TIMEOUT', 30))
+
+    STAGE_LIMITS = {
+        'llm': int(os.getenv('PIPELINE_LLM_CONCURRENCY', 4)),
+        'tts': int(os.getenv('PIPELINE_TTS_CONCURRENCY', 4)),
+        'db': int(os.getenv('PIPELINE_DB_CONCURRENCY', 1))
+    }
+
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 8))
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+
+    STORY_INSERT = '''INSERT INTO stories (id, project_id, title, description, content, created_at)
+                      VALUES (?, ?, ?, ?, ?, ?)'''
+
+    SCENE_INSERT = '''INSERT INTO scenes (id, project_id, story_id, sequence, title, background_type, characters, narration, duration, transitions, created_at)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+    AUDIO_TRACK_INSERT = '''INSERT INTO audio_tracks (id, project_id, scene_id, track_type, content, duration, file_path, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+
+    _semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in STAGE_LIMITS.items()}
+    _stats_lock = threading.Lock()
+    _stage_stats = {name: {'active': 0, 'waiting': 0, 'completed': 0, 'wait_seconds': 0.0, 'busy_seconds': 0.0}
+                    for name in STAGE_LIMITS}
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    @contextmanager
+    def stage(name: str):
+        """Hold one of the stage's concurrency slots for the duration of the block"""
+        started_at = StoryPipeline.acquire_stage(name)
+        try:
+            yield
+        finally:
+            StoryPipeline.release_stage(name, started_at)
+
+    @staticmethod
+    def acquire_stage(name: str) -> float:
+        """Wait for one of the stage's slots; return the time it was granted"""
+        stats = StoryPipeline._stage_stats[name]
+        with StoryPipeline._stats_lock:
+            stats['waiting'] += 1
+        queued_at = time.perf_counter()
+        StoryPipeline._semaphores[name].acquire()
+        started_at = time.perf_counter()
+        with StoryPipeline._stats_lock:
+            stats['waiting'] -= 1
+            stats['active'] += 1
+            stats['wait_seconds'] += started_at - queued_at
+        return started_at
+
+    @staticmethod
+    def release_stage(name: str, started_at: float):
+        stats = StoryPipeline._stage_stats[name]
+        with StoryPipeline._stats_lock:
+            stats['active'] -= 1
+            stats['completed'] += 1
+            stats['busy_seconds'] += time.perf_counter() - started_at
+        StoryPipeline._semaphores[name].release()
+
+    @staticmethod
+    def synthesize(narration: str, scene_id: str) -> futures.Future:
+        """Queue a scene's narration holding a 'tts' slot until that synthesis finishes"""
+        started_at = StoryPipeline.acquire_stage('tts')
+        try:
+            job = AudioService.generate_audio_async(narration, scene_id)
+        except Exception:
+            StoryPipeline.release_stage('tts', started_at)
+            raise
+        job.add_done_callback(lambda done: StoryPipeline.release_stage('tts', started_at))
+        return job
+
+    @staticmethod
+    def create(project_id: str, prompt: str, use_cache: bool = True, audio_timeout: float = None) -> dict:
+        """Generate, store and narrate a story; return the create_story response body"""
+        with StoryPipeline.stage('llm'):
+            story_data = StoryGenerator.generate_from_prompt(prompt, use_cache=use_cache)
+
+        story_id = story_data['story_id']
+        title = story_data['title']
+
+        scenes = []
+        for scene in story_data.get('scenes', []):
+            StoryPipeline.plan_scene(scene)
+            scenes.append((str(uuid.uuid4()), scene))
+
+        with StoryPipeline.stage('db'):
+            execute_db(
+                StoryPipeline.STORY_INSERT,
+                (story_id, project_id, title, prompt, StoryPipeline.story_content(story_id, title, scenes),
+                 datetime.now().isoformat())
+            )
+            execute_many_db(
+                StoryPipeline.SCENE_INSERT,
+                [StoryPipeline.scene_row(scene_id, project_id, story_id, scene) for scene_id, scene in scenes]
+            )
+        SceneCache.invalidate(project_id=project_id)
+
+        # Synthesize the scenes concurrently on the TTS worker pool; slots are
+        # held per synthesis, not while this story waits for its audio
+        audio_jobs = {}
+        for scene_id, scene in scenes:
+            narration = scene.get('narration', '')
+            if narration and narration.strip():
+                try:
+                    audio_jobs[scene_id] = StoryPipeline.synthesize(narration, scene_id)
+                except Exception as e:
+                    print(f"Error generating audio for scene {scene_id}: {e}")
+
+        timeout = StoryPipeline.AUDIO_TIMEOUT if audio_timeout is None else audio_timeout
+        futures.wait(audio_jobs.values(), timeout=timeout)
+
+        # Save audio tracks for every finished scene in one batch
+        audio_rows = []
+        audio_files = {}
+        for scene_id, scene in scenes:
+            job = audio_jobs.get(scene_id)
+            if job is None:
+                continue
+            if not job.done():
+                # Record the track whenever synthesis finishes
+                job.add_done_callback(
+                    lambda done, scene_id=scene_id, narration=scene.get('narration', ''):
+                        StoryPipeline.record_late_audio(done, project_id, scene_id, narration)
+                )
+                continue
+            try:
+                audio_filename = job.result()
+            except Exception as e:
+                print(f"Error generating audio for scene {scene_id}: {e}")
+                continue
+            audio_files[scene_id] = audio_filename
+            audio_rows.append(StoryPipeline.audio_track_row(project_id, scene_id, scene.get('narration', ''), audio_filename))
+
+        with StoryPipeline.stage('db'):
+            execute_many_db(StoryPipeline.AUDIO_TRACK_INSERT, audio_rows)
+
+        scenes_response = []
+        for scene_id, scene in scenes:
+            scenes_response.append({
+                'id': scene_id,
+                'sequence': scene.get('sequence', 1),
+                'title': scene.get('title', ''),
+                'background': scene.get('background', 'forest'),
+                'narration': scene.get('narration', ''),
+                'duration': scene['duration'],
+                'audio_filename': audio_files.get(scene_id),
+                'audio_ready': scene_id in audio_files
+            })
+
+        return {
+            'story_id': story_id,
+            'title': title,
+            'scenes': scenes_response
+        }
+
+    @staticmethod
+    def run_batch(items: list, use_cache: bool = True, audio_timeout: float = None):
+        """Create a story for every {'project_id', 'prompt'} item on the batch worker pool.
+
+        Yields one result per item, in completion order. Items that have not
+        started are cancelled if the caller stops iterating.
+        """
+        executor = StoryPipeline._get_executor()
+        pending = {}
+        for index, item in enumerate(items):
+            future = executor.submit(
+                StoryPipeline.create, item['project_id'], item.get('prompt', ''),
+                use_cache and not item.get('bypass_cache', False), audio_timeout
+            )
+            pending[future] = (index, item, time.perf_counter())
+
+        try:
+            for future in futures.as_completed(pending):
+                index, item, submitted_at = pending.pop(future)
+                result = {'index': index, 'project_id': item['project_id']}
+                try:
+                    result['story'] = future.result()
+                    result['status'] = 'ok'
+                except Exception as e:
+                    print(f"Error creating story for batch item {index}: {e}")
+                    result['status'] = 'error'
+                    result['error'] = str(e)
+                result['seconds'] = round(time.perf_counter() - submitted_at, 3)
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+    @staticmethod
+    def stats() -> dict:
+        with StoryPipeline._stats_lock:
+            stages = {name: dict(stats, limit=StoryPipeline.STAGE_LIMITS[name])
+                      for name, stats in StoryPipeline._stage_stats.items()}
+        return {'batch_workers': StoryPipeline.BATCH_WORKERS, 'stages': stages}
+
+    @staticmethod
+    def plan_scene(scene: dict):
+        """Size a scene to its narration before any audio exists"""
+        scene['duration'] = AudioService.estimate_scene_duration(
+            scene.get('narration', ''), float(scene.get('duration', 3))
+        )
+
+    @staticmethod
+    def story_content(story_id: str, title: str, scenes: list) -> str:
+        """Serialize a generated story for stories.content from its (scene_id, scene) pairs.
+
+        Both create paths store this, so GET /api/stories/<id> and the search
+        index see the same shape however the story was made.
+        """
+        return json.dumps({
+            'story_id': story_id,
+            'title': title,
+            'scenes': [
+                {
+                    'id': scene_id,
+                    'sequence': scene.get('sequence', idx),
+                    'title': scene.get('title', ''),
+                    'background': scene.get('background', 'forest'),
+                    'characters': scene.get('characters', []),
+                    'narration': scene.get('narration', ''),
+                    'duration': scene.get('duration', 3)
+                }
+                for idx, (scene_id, scene) in enumerate(scenes, 1)
+            ]
+        })
+
+    @staticmethod
+    def scene_row(scene_id, project_id, story_id, scene) -> tuple:
+        """Build the scenes parameters for a generated scene"""
+        return (scene_id, project_id, story_id, scene.get('sequence', 1), scene.get('title', ''),
+                scene.get('background', 'forest'), json.dumps(scene.get('characters', [])), scene.get('narration', ''),
+                scene.get('duration', 3), json.dumps(scene.get('animations', [])), datetime.now().isoformat())
+
+    @staticmethod
+    def audio_track_row(project_id, scene_id, narration, audio_filename) -> tuple:
+        """Build the audio_tracks parameters for a synthesized narration"""
+        audio_duration = AudioService.get_audio_duration(audio_filename, narration)
+        return (str(uuid.uuid4()), project_id, scene_id, 'narration', narration,
+                audio_duration, audio_filename, datetime.now().isoformat())
+
+    @staticmethod
+    def record_late_audio(job, project_id, scene_id, narration):
+        """Save the audio track for a scene whose synthesis outlived the request"""
+        try:
+            audio_filename = job.result()
+            execute_db(StoryPipeline.AUDIO_TRACK_INSERT,
+                       StoryPipeline.audio_track_row(project_id, scene_id, narration, audio_filename))
+        except Exception as e:
+            print(f"Error generating audio for scene {scene_id}: {e}")
+
+    @staticmethod
+    def _get_executor() -> futures.ThreadPoolExecutor:
+        with StoryPipeline._executor_lock:
+            if StoryPipeline._executor is None:
+                StoryPipeline._executor = futures.ThreadPoolExecutor(
+                    max_workers=StoryPipeline.BATCH_WORKERS,
+                    thread_name_prefix='story-batch'
+                )
+            return StoryPipeline._executor
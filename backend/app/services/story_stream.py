@@ -0,0 +1,105 @@
+import json
+
+
+class SceneStreamParser:
+    """Incrementally pull scenes out of a streamed story JSON document.
+
+    Feed response text as it arrives; each call returns the scene objects
+    from the top-level "scenes" array that became complete. Anything before
+    the first '{' (such as a markdown fence) is ignored, and only the text of
+    a scene still being received is kept in memory.
+    """
+
+    def __init__(self):
+        self.title = None
+        self.done = False
+        self._buffer = ''
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._expect_key = False
+        self._root_key = None
+        self._in_scenes = False
+        self._scene_start = None
+
+    def feed(self, text: str) -> list:
+        """Consume more response text and return newly completed scenes"""
+        scenes = []
+        self._buffer += text
+        buffer = self._buffer
+
+        for i in range(self._pos, len(buffer)):
+            if self.done:
+                break
+            c = buffer[i]
+
+            if not self._started:
+                if c != '{':
+                    continue
+                self._started = True
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._root_string(buffer[self._string_start:i + 1])
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == '{' or c == '[':
+                if c == '[' and self._depth == 1 and self._root_key == 'scenes':
+                    self._in_scenes = True
+                if c == '{' and self._in_scenes and self._depth == 2:
+                    self._scene_start = i
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif c == '}' or c == ']':
+                self._depth -= 1
+                if c == '}' and self._in_scenes and self._depth == 2 and self._scene_start is not None:
+                    scene = json.loads(buffer[self._scene_start:i + 1])
+                    if isinstance(scene, dict):
+                        scenes.append(scene)
+                    self._scene_start = None
+                elif c == ']' and self._in_scenes and self._depth == 1:
+                    self._in_scenes = False
+                if self._depth == 0:
+                    self.done = True
+            elif c == ',' and self._depth == 1:
+                self._expect_key = True
+
+        self._trim()
+        return scenes
+
+    def _root_string(self, token: str):
+        """Track keys of the root object and capture the story title"""
+        value = json.loads(token)
+        if self._expect_key:
+            self._root_key = value
+            self._expect_key = False
+        elif self._root_key == 'title':
+            self.title = value
+
+    def _trim(self):
+        """Drop text that no pending scene or string still needs"""
+        keep = len(self._buffer)
+        if self._scene_start is not None:
+            keep = min(keep, self._scene_start)
+        if self._in_string:
+            keep = min(keep, self._string_start)
+
+        self._buffer = self._buffer[keep:]
+        self._pos = len(self._buffer)
+        if self._scene_start is not None:
+            self._scene_start -= keep
+        if self._in_string:
+            self._string_start -= keep
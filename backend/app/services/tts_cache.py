@@ -0,0 +1,128 @@
+import hashlib
+import os
+import shutil
+import unicodedata
+import uuid
+from app.services.disk_cache import ContentAddressedCache
+
+
+class TTSCache(ContentAddressedCache):
+    """Content-addressed store of synthesized WAV files.
+
+    Entries live under <cache_dir>/<key[:2]>/<key>.wav, where the key hashes
+    the normalized text together with every parameter that changes the
+    audio. Scene-specific files are hard links to the entries (or copies
+    where the filesystem cannot link). The entry's mtime is bumped on every
+    hit, and the least recently used entries are deleted once the cache
+    grows past max_bytes.
+    """
+
+    # Bump to invalidate every entry after a change to synthesis settings
+    CACHE_VERSION = 1
+
+    EXTENSION = '.wav'
+
+    def __init__(self, cache_dir: str, max_bytes: int = None):
+        super().__init__(cache_dir, max_bytes if max_bytes is not None
+                         else int(os.getenv('TTS_CACHE_MAX_BYTES', 512 * 1024 * 1024)))
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalize text so trivially different strings share an entry"""
+        return ' '.join(unicodedata.normalize('NFC', text).split())
+
+    @staticmethod
+    def engine_version() -> str:
+        """Identify the TTS engine build that produced an entry"""
+        from app.services.tts_pool import TTS_BACKEND
+        if TTS_BACKEND == 'silent':
+            # Never serve silent stand-in audio as real speech, or the reverse
+            return 'silent'
+        try:
+            from importlib.metadata import version
+            return f"pyttsx3-{version('pyttsx3')}"
+        except Exception:
+            return 'pyttsx3-unknown'
+
+    def key(self, text: str, rate: int, volume: float, voice: str = None, engine: str = None) -> str:
+        """Return the content hash for a synthesis request"""
+        parts = [
+            str(TTSCache.CACHE_VERSION),
+            engine or TTSCache.engine_version(),
+            voice or '',
+            str(rate),
+            f'{volume:.3f}',
+            TTSCache.normalize_text(text)
+        ]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def temp_path(self, key: str) -> str:
+        """Return a unique scratch path next to the entry for writing a new result"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f'{path}.{uuid.uuid4().hex}.tmp.wav'
+
+    def lookup(self, key: str) -> str:
+        """Return the cached file for key, or None on a miss"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+        with self._lock:
+            self._stats['hits'] += 1
+        return path
+
+    def store(self, key: str, source_path: str) -> str:
+        """Move a freshly synthesized file into the cache and return the entry path"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A concurrent or repeated store of the key replaces the entry; only the difference is counted
+        self._replace(source_path, path)
+        return path
+
+    @staticmethod
+    def link(cache_path: str, dest_path: str):
+        """Atomically make dest_path refer to the cached file.
+
+        The entry's key is recorded in a <dest_path>.key sidecar together
+        with the inode it describes, so content derived from the audio can be
+        keyed on it (see linked_key).
+        """
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        tmp_path = f'{dest_path}.{uuid.uuid4().hex}.tmp'
+        try:
+            os.link(cache_path, tmp_path)
+        except OSError:
+            shutil.copyfile(cache_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+
+        key = os.path.basename(cache_path)[:-len(TTSCache.EXTENSION)]
+        sidecar_tmp = f'{dest_path}.{uuid.uuid4().hex}.tmp.key'
+        with open(sidecar_tmp, 'w') as f:
+            f.write(f'{key} {os.stat(dest_path).st_ino}')
+        os.replace(sidecar_tmp, f'{dest_path}.key')
+
+    @staticmethod
+    def linked_key(path: str) -> str:
+        """Return the cache key path was linked from, or None if unknown or since replaced"""
+        try:
+            with open(f'{path}.key') as f:
+                key, inode = f.read().split()
+            if int(inode) != os.stat(path).st_ino:
+                return None
+        except (OSError, ValueError):
+            return None
+        return key
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['bytes'] = self._total_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_bytes'] = self.max_bytes
+        return stats
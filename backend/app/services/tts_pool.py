@@ -0,0 +1,291 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import wave
+from concurrent.futures import Future
+
+
+# 'pyttsx3' (default) or 'silent' for offline load testing
+TTS_BACKEND = os.getenv('TTS_BACKEND', 'pyttsx3').lower()
+
+
+class SilentTTSEngine:
+    """Offline stand-in for a pyttsx3 engine that writes silent WAVs.
+
+    Each file is as long as the duration model predicts for its text, so
+    lip sync, scene timing and exports behave as with real speech.
+    TTS_SILENT_REALTIME_FACTOR simulates synthesis time in seconds per
+    second of audio.
+    """
+
+    SAMPLE_RATE = 22050
+
+    def __init__(self):
+        self.properties = {'rate': 200, 'volume': 1.0, 'voice': None}
+        self.realtime_factor = float(os.getenv('TTS_SILENT_REALTIME_FACTOR', 0))
+        self._jobs = []
+
+    def setProperty(self, name: str, value):
+        self.properties[name] = value
+
+    def save_to_file(self, text: str, filepath: str):
+        self._jobs.append((text, filepath))
+
+    def runAndWait(self):
+        from app.services.duration_model import DurationModel
+        jobs, self._jobs = self._jobs, []
+        for text, filepath in jobs:
+            duration = DurationModel.predict(text, self.properties['rate'])
+            if self.realtime_factor:
+                time.sleep(duration * self.realtime_factor)
+            with wave.open(filepath, 'wb') as wav_file:
+                wav_file.setnchannels(1)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(SilentTTSEngine.SAMPLE_RATE)
+                wav_file.writeframes(b'\x00\x00' * int(duration * SilentTTSEngine.SAMPLE_RATE))
+
+
+def create_engine(rate: int, volume: float):
+    """Return an initialized TTS engine for the configured TTS_BACKEND"""
+    if TTS_BACKEND == 'silent':
+        engine = SilentTTSEngine()
+    else:
+        import pyttsx3
+        engine = pyttsx3.init()
+    engine.setProperty('rate', rate)
+    engine.setProperty('volume', volume)
+    return engine
+
+
+def _worker_main(conn, rate: int, volume: float):
+    """Worker process: own one initialized TTS engine and synthesize jobs from the pipe"""
+    try:
+        engine = create_engine(rate, volume)
+    except Exception as e:
+        conn.send(('error', f'{type(e).__name__}: {e}'))
+        return
+
+    properties = {'rate': rate, 'volume': volume, 'voice': None}
+    conn.send(('ready', None))
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+
+        text, filepath, options = job
+        try:
+            for name, value in options.items():
+                if value is not None and properties.get(name) != value:
+                    engine.setProperty(name, value)
+                    properties[name] = value
+            engine.save_to_file(text, filepath)
+            engine.runAndWait()
+            conn.send(('ok', filepath))
+        except Exception as e:
+            conn.send(('error', f'{type(e).__name__}: {e}'))
+
+
+class TTSWorkerPool:
+    """Pool of long-lived TTS worker processes fed from a shared job queue.
+
+    Each worker process initializes its engine once and is driven by a
+    dispatcher thread in this process, which owns one worker slot. A job
+    that exceeds the timeout or kills its worker fails its future, and the
+    worker is restarted for the next job.
+    """
+
+    STARTUP_TIMEOUT = 30
+
+    def __init__(self, size: int = None, timeout: float = None, rate: int = 150, volume: float = 0.9):
+        self.size = size if size is not None else int(os.getenv('TTS_WORKERS', 2))
+        self.timeout = timeout if timeout is not None else float(os.getenv('TTS_TIMEOUT', 60))
+        self.rate = rate
+        self.volume = volume
+
+        self._context = multiprocessing.get_context('spawn')
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {'completed': 0, 'failed': 0, 'timeouts': 0, 'restarts': 0}
+
+        # (process, conn) per slot; a slot's lock is held while its worker starts or runs a job
+        self._workers = [None] * self.size
+        self._slot_locks = [threading.Lock() for _ in range(self.size)]
+
+        self._threads = []
+        for i in range(self.size):
+            thread = threading.Thread(target=self._dispatch, args=(i,), name=f'tts-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, text: str, filepath: str, rate: int = None, volume: float = None, voice: str = None) -> Future:
+        """Queue a synthesis job; the future resolves to the written file path"""
+        if self._closed:
+            raise RuntimeError('TTS worker pool is shut down')
+
+        future = Future()
+        options = {'rate': rate, 'volume': volume, 'voice': voice}
+        self._jobs.put((future, (text, filepath, options)))
+        return future
+
+    def synthesize(self, text: str, filepath: str, **options) -> str:
+        """Synthesize text to a file and block until it is written"""
+        return self.submit(text, filepath, **options).result()
+
+    def warm_up(self):
+        """Start the worker processes now instead of on their first job"""
+        if self._closed:
+            return
+        for i in range(self.size):
+            threading.Thread(target=self._warm_slot, args=(i,), name=f'tts-warm-up-{i}', daemon=True).start()
+
+    def shutdown(self):
+        """Stop all dispatcher threads and their worker processes"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        """Return job and restart counters"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['workers'] = self.size
+        stats['queued'] = self._jobs.qsize()
+        return stats
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _start_process(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.rate, self.volume),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        if not parent_conn.poll(self.STARTUP_TIMEOUT):
+            self._stop_process(process, parent_conn)
+            raise TimeoutError('TTS worker did not start in time')
+        status, message = parent_conn.recv()
+        if status != 'ready':
+            self._stop_process(process, parent_conn)
+            raise RuntimeError(f'TTS worker failed to start: {message}')
+        return process, parent_conn
+
+    @staticmethod
+    def _stop_process(process, conn, graceful: bool = False):
+        if graceful:
+            try:
+                conn.send(None)
+                process.join(timeout=2)
+            except (OSError, ValueError):
+                pass
+        if process.is_alive():
+            process.kill()
+            process.join(timeout=2)
+        conn.close()
+
+    def _warm_slot(self, index: int):
+        with self._slot_locks[index]:
+            if self._closed or self._workers[index] is not None:
+                return
+            try:
+                self._workers[index] = self._start_process()
+            except Exception as e:
+                print(f"Error starting TTS worker: {e}")
+
+    def _dispatch(self, index: int):
+        """Feed jobs to one worker slot until shutdown"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+
+            future, payload = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._slot_locks[index]:
+                self._run_job(index, future, payload)
+
+        with self._slot_locks[index]:
+            worker, self._workers[index] = self._workers[index], None
+        if worker is not None:
+            self._stop_process(*worker, graceful=True)
+
+    def _run_job(self, index: int, future: Future, payload):
+        """Run one job on a slot's worker, restarting it when it hangs or dies"""
+        process, conn = self._workers[index] or (None, None)
+        try:
+            try:
+                if process is None or not process.is_alive():
+                    if process is not None:
+                        self._stop_process(process, conn)
+                        self._count('restarts')
+                    process, conn = None, None
+                    process, conn = self._start_process()
+
+                conn.send(payload)
+                if not conn.poll(self.timeout):
+                    self._count('timeouts')
+                    raise TimeoutError(f'TTS synthesis exceeded {self.timeout}s')
+                status, value = conn.recv()
+            except TimeoutError as e:
+                if process is not None:
+                    self._stop_process(process, conn)
+                    process = conn = None
+                    self._count('restarts')
+                self._count('failed')
+                future.set_exception(e)
+                return
+            except (EOFError, OSError):
+                exitcode = None
+                if process is not None:
+                    process.join(timeout=1)
+                    exitcode = process.exitcode
+                    self._stop_process(process, conn)
+                    process = conn = None
+                    self._count('restarts')
+                self._count('failed')
+                future.set_exception(RuntimeError(f'TTS worker crashed (exit code {exitcode})'))
+                return
+            except Exception as e:
+                self._count('failed')
+                future.set_exception(e)
+                return
+        finally:
+            self._workers[index] = (process, conn) if process is not None else None
+
+        if status == 'ok':
+            self._count('completed')
+            future.set_result(value)
+        else:
+            self._count('failed')
+            future.set_exception(RuntimeError(value))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tts_pool() -> TTSWorkerPool:
+    """Return the process-wide TTS worker pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TTSWorkerPool()
+            atexit.register(_pool.shutdown)
+        return _pool
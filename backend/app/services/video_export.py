@@ -1,7 +1,10 @@
+import asyncio
 import os
 import subprocess
 import json
 from pathlib import Path
+from app.services.animation_engine import AnimationEngine
+from app.services.metrics import Metrics
 
 class VideoExportService:
     """Export rendered frames and audio to MP4 video"""
@@ -20,7 +23,8 @@ class VideoExportService:
             # Convert SVG to PNG
             # Note: This requires ImageMagick to be installed: convert command
             cmd = f'convert "{svg_path}" "{filepath}"'
-            result = subprocess.run(cmd, shell=True, capture_output=True)
+            with Metrics.stage_timer('rasterize'):
+                result = subprocess.run(cmd, shell=True, capture_output=True)
             
             # Clean up SVG
             os.remove(svg_path)
@@ -30,54 +34,94 @@ class VideoExportService:
             print(f"Error saving frame: {e}")
             return False
     
+    @staticmethod
+    def render_scene_frames(scene: dict, char_defs: dict, frame_dir: str, first_frame: int,
+                            start: int, stop: int) -> int:
+        """Render frames start..stop of a scene, numbered from the scene's first frame; return the count"""
+        rendered = 0
+        for frame_num in range(start, stop):
+            svg = AnimationEngine.render_scene_frame(scene, char_defs, frame_num)
+            
+            # Save as PNG (requires ImageMagick)
+            png_path = os.path.join(frame_dir, f'frame_{first_frame + frame_num:06d}.png')
+            # VideoExportService.save_frame_as_png(svg, png_path)
+            
+            rendered += 1
+        return rendered
+    
+    @staticmethod
+    def ffmpeg_command(frame_dir: str, output_path: str, audio_path: str = None, frame_rate: int = 30) -> list:
+        """Build the FFmpeg command that encodes the frames (and soundtrack) to MP4"""
+        # Command to create video from frames
+        frame_pattern = os.path.join(frame_dir, 'frame_%06d.png')
+        cmd = [
+            'ffmpeg',
+            '-framerate', str(frame_rate),
+            '-i', frame_pattern
+        ]
+        
+        # Mux audio in the same pass; inputs must precede the output path
+        if audio_path and os.path.exists(audio_path):
+            cmd.extend([
+                '-i', audio_path,
+                '-map', '0:v', '-map', '1:a',
+                '-c:a', 'aac',
+                '-shortest'
+            ])
+        
+        cmd.extend([
+            '-c:v', 'libx264',
+            '-pix_fmt', 'yuv420p',
+            '-preset', 'slow',
+            '-y',  # Overwrite output file
+            output_path
+        ])
+        return cmd
+    
     @staticmethod
     def create_video_from_frames(frame_dir: str, output_path: str, audio_path: str = None, 
                                 frame_rate: int = 30, width: int = 1280, height: int = 720) -> dict:
         """Create MP4 video from PNG frames using FFmpeg"""
         try:
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # Command to create video from frames
-            frame_pattern = os.path.join(frame_dir, 'frame_%06d.png')
-            cmd = [
-                'ffmpeg',
-                '-framerate', str(frame_rate),
-                '-i', frame_pattern,
-                '-c:v', 'libx264',
-                '-pix_fmt', 'yuv420p',
-                '-preset', 'slow',
-                '-y',  # Overwrite output file
-                output_path
-            ]
-            
-            # Add audio if provided
-            if audio_path and os.path.exists(audio_path):
-                cmd.extend(['-i', audio_path, '-c:a', 'aac', '-shortest'])
+            cmd = VideoExportService.ffmpeg_command(frame_dir, output_path, audio_path, frame_rate)
             
             # Run FFmpeg
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                file_size = os.path.getsize(output_path)
-                return {
-                    'success': True,
-                    'output_path': output_path,
-                    'file_size': file_size,
-                    'message': 'Video exported successfully'
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': result.stderr,
-                    'message': 'FFmpeg conversion failed'
-                }
+            with Metrics.stage_timer('encode'):
+                result = subprocess.run(cmd, capture_output=True, text=True)
+            return VideoExportService._ffmpeg_result(result.returncode, result.stderr, output_path)
         
         except FileNotFoundError:
+            return VideoExportService._ffmpeg_missing()
+        except Exception as e:
             return {
                 'success': False,
-                'error': 'FFmpeg not found. Please install FFmpeg and add it to PATH.',
-                'message': 'FFmpeg not installed'
+                'error': str(e),
+                'message': 'Error creating video'
             }
+    
+    @staticmethod
+    async def create_video_from_frames_async(frame_dir: str, output_path: str, audio_path: str = None,
+                                             frame_rate: int = 30) -> dict:
+        """Awaitable create_video_from_frames that runs FFmpeg without holding a thread"""
+        try:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            cmd = VideoExportService.ffmpeg_command(frame_dir, output_path, audio_path, frame_rate)
+            
+            with Metrics.stage_timer('encode'):
+                process = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                )
+                try:
+                    _, stderr = await process.communicate()
+                except asyncio.CancelledError:
+                    process.kill()
+                    await process.wait()
+                    raise
+            return VideoExportService._ffmpeg_result(process.returncode, stderr.decode(errors='replace'), output_path)
+        
+        except FileNotFoundError:
+            return VideoExportService._ffmpeg_missing()
         except Exception as e:
             return {
                 'success': False,
@@ -85,6 +129,31 @@ class VideoExportService:
                 'message': 'Error creating video'
             }
     
+    @staticmethod
+    def _ffmpeg_result(returncode: int, stderr: str, output_path: str) -> dict:
+        if returncode == 0:
+            file_size = os.path.getsize(output_path)
+            return {
+                'success': True,
+                'output_path': output_path,
+                'file_size': file_size,
+                'message': 'Video exported successfully'
+            }
+        else:
+            return {
+                'success': False,
+                'error': stderr,
+                'message': 'FFmpeg conversion failed'
+            }
+    
+    @staticmethod
+    def _ffmpeg_missing() -> dict:
+        return {
+            'success': False,
+            'error': 'FFmpeg not found. Please install FFmpeg and add it to PATH.',
+            'message': 'FFmpeg not installed'
+        }
+    
     @staticmethod
     def merge_audio_video(video_path: str, audio_path: str, output_path: str) -> dict:
         """Merge audio track with existing video"""
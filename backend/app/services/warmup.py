@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+
+
+WARMUP_ENABLED = os.getenv('WARMUP', '1') != '0'
+
+# Seconds to wait after startup so warm-up does not compete with binding the server
+WARMUP_DELAY = float(os.getenv('WARMUP_DELAY', 1.0))
+
+_status = {'state': 'pending', 'steps': {}, 'render_caches': None}
+
+
+def build_render_caches() -> dict:
+    """Render the predefined backgrounds and character sprites ahead of the first frame"""
+    from app.services.animation_engine import AnimationEngine
+    from app.services.story_generator import StoryGenerator
+
+    started_at = time.perf_counter()
+    stats = AnimationEngine.prebuild_caches(
+        StoryGenerator.get_available_characters(),
+        StoryGenerator.get_available_backgrounds()
+    )
+    stats['seconds'] = round(time.perf_counter() - started_at, 3)
+    _status['render_caches'] = stats
+    return stats
+
+
+def warm_up() -> dict:
+    """Pre-initialize the render caches and the lazily loaded LLM and audio stacks; return per-step timings"""
+    from app.services.llm_client import get_llm_client
+    from app.services.audio_service import AudioService
+
+    _status['state'] = 'running'
+    steps = (('render', build_render_caches), ('llm', get_llm_client().warm_up), ('audio', AudioService.warm_up))
+    for name, step in steps:
+        started_at = time.perf_counter()
+        try:
+            step()
+            result = {'ok': True}
+        except Exception as e:
+            print(f"Error warming up {name}: {e}")
+            result = {'ok': False, 'error': str(e)}
+        result['seconds'] = round(time.perf_counter() - started_at, 3)
+        _status['steps'][name] = result
+    _status['state'] = 'done'
+    return dict(_status['steps'])
+
+
+def start_warmup(delay: float = None):
+    """Run warm_up on a background thread once the server has had time to start"""
+    if not WARMUP_ENABLED:
+        _status['state'] = 'disabled'
+        return None
+
+    delay = WARMUP_DELAY if delay is None else delay
+
+    def _run():
+        time.sleep(delay)
+        warm_up()
+
+    thread = threading.Thread(target=_run, name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_status() -> dict:
+    return {'state': _status['state'], 'steps': dict(_status['steps']), 'render_caches': _status['render_caches']}
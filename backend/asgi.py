@@ -0,0 +1,16 @@
+"""Async (ASGI) entry point.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Scene previews and export progress streams are served by async handlers,
+so one process can hold thousands of open connections; every other route
+runs in the Flask app on a thread pool.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app
+from app.asgi import create_asgi_app
+
+app = create_asgi_app(create_app())
@@ -0,0 +1,205 @@
+"""Microbenchmarks for the animation engine.
+
+Times AnimationEngine.render_scene_frame, create_character_svg,
+generate_keyframes, create_speech_bubble and MouthShapes on fixed fixtures
+(1 to 8 characters, every background, short and long narration) and reports
+ops/sec, peak bytes allocated per call and output size. Results are compared
+with a stored baseline; the run fails (exit code 1) when a case gets slower,
+or allocates more, by more than the threshold.
+
+    python benchmarks/engine_microbench.py
+    python benchmarks/engine_microbench.py --filter render_scene_frame/8chars
+    python benchmarks/engine_microbench.py --save-baseline   # on the reference machine
+
+Saving merges into the existing baseline, so --save-baseline with --filter
+only refreshes the selected cases. Without a baseline the run fails (exit
+code 2) unless --allow-missing-baseline is given.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.animation_engine import AnimationEngine, MouthShapes
+from app.services.story_generator import StoryGenerator
+
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, 'benchmarks', 'engine_baseline.json')
+
+# Allowed slowdown (fraction of baseline ops/sec) and allocation growth
+DEFAULT_THRESHOLD = float(os.getenv('BENCH_THRESHOLD', 0.15))
+
+SHORT_NARRATION = 'Once upon a time, a hero set out.'
+LONG_NARRATION = (
+    'Long ago, beyond the misty mountains and the whispering forest, there lived a curious young hero '
+    'who dreamed of distant lands. Every morning she climbed the tallest hill to watch the sun rise over '
+    'the valley, wondering what secrets waited past the horizon. One day a wise old wizard appeared at her '
+    'door with a map, a riddle and a warning: the journey would test her courage, her kindness and her wits.'
+)
+
+CHARACTER_COUNTS = (1, 2, 4, 8)
+
+
+def scene_fixture(num_characters: int, background: str, narration: str) -> dict:
+    """A scene with num_characters characters spread across the stage"""
+    ids = list(StoryGenerator.CHARACTERS)
+    characters = []
+    for idx in range(num_characters):
+        characters.append({
+            'character_id': ids[idx % len(ids)],
+            'position': {'x': 0.1 + 0.8 * idx / max(1, num_characters - 1), 'y': 0.65},
+            'expression': ('neutral', 'happy', 'surprised', 'sad')[idx % 4]
+        })
+    return {'background_type': background, 'characters': characters, 'narration': narration}
+
+
+def cases():
+    """Yield (name, fn) for every benchmark case"""
+    char_defs = StoryGenerator.get_available_characters()
+    narrations = (('short', SHORT_NARRATION), ('long', LONG_NARRATION))
+
+    for count in CHARACTER_COUNTS:
+        for background in StoryGenerator.BACKGROUNDS:
+            for label, narration in narrations:
+                scene = scene_fixture(count, background, narration)
+                yield (f'render_scene_frame/{count}chars/{background}/{label}',
+                       lambda scene=scene: AnimationEngine.render_scene_frame(scene, char_defs, 7))
+
+    hero = dict(StoryGenerator.CHARACTERS['hero'], name='hero')
+    for mouth_shape in MouthShapes.SHAPES:
+        yield (f'create_character_svg/{mouth_shape}',
+               lambda mouth_shape=mouth_shape: AnimationEngine.create_character_svg(
+                   hero, {'x': 0.4, 'y': 0.65}, 'happy', mouth_shape, True))
+
+    for animation_type in ('entrance', 'movement', 'celebration', 'expression_change'):
+        yield (f'generate_keyframes/{animation_type}',
+               lambda animation_type=animation_type: AnimationEngine.generate_keyframes(
+                   animation_type, 3.0, {'x': 0.3, 'y': 0.65}, {'x': 0.7, 'y': 0.6}))
+
+    for label, narration in narrations:
+        yield (f'create_speech_bubble/{label}',
+               lambda narration=narration: AnimationEngine.create_speech_bubble(
+                   narration, {'x': 0.4, 'y': 0.65}, '#FF6B6B'))
+
+    yield ('MouthShapes/get_mouth_for_phoneme',
+           lambda: [MouthShapes.get_mouth_for_phoneme(c) for c in LONG_NARRATION.lower()])
+
+
+def output_size(result) -> int:
+    if isinstance(result, str):
+        return len(result.encode())
+    return len(json.dumps(result).encode())
+
+
+def measure(fn, min_time: float, repeats: int) -> dict:
+    """Best ops/sec over several timed runs, peak bytes allocated by one call, output size"""
+    result = fn()  # Warm caches before timing
+
+    # Size the loop so each run lasts about min_time / repeats
+    loops = 1
+    while True:
+        started_at = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started_at
+        if elapsed >= min_time / repeats / 4:
+            break
+        loops *= 4
+    loops = max(1, int(loops * (min_time / repeats) / max(elapsed, 1e-9)))
+
+    best = None
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ops_per_sec': round(loops / best, 1),
+        'alloc_bytes': peak - before,
+        'output_bytes': output_size(result)
+    }
+
+
+def compare(name: str, current: dict, baseline: dict, threshold: float) -> list:
+    """Return failure messages for a case that regressed past the threshold"""
+    failures = []
+    if current['ops_per_sec'] < baseline['ops_per_sec'] * (1 - threshold):
+        failures.append(f"{name}: {current['ops_per_sec']:.0f} ops/s is "
+                        f"{1 - current['ops_per_sec'] / baseline['ops_per_sec']:.0%} slower than baseline "
+                        f"({baseline['ops_per_sec']:.0f} ops/s)")
+    if current['alloc_bytes'] > baseline['alloc_bytes'] * (1 + threshold) + 1024:
+        failures.append(f"{name}: allocates {current['alloc_bytes']} bytes per call, "
+                        f"baseline {baseline['alloc_bytes']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this text')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds of timing per case')
+    parser.add_argument('--repeats', type=int, default=5, help='timed runs per case; the fastest counts')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--allow-missing-baseline', action='store_true',
+                        help='exit 0 when there is no baseline to compare with')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['cases']
+
+    results = {}
+    failures = []
+    print(f"{'case':58} {'ops/s':>11} {'alloc B':>9} {'out B':>8} {'vs base':>8}")
+    for name, fn in cases():
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(fn, args.min_time, args.repeats)
+        change = ''
+        if name in baseline and not args.save_baseline:
+            change = f"{result['ops_per_sec'] / baseline[name]['ops_per_sec'] - 1:+.1%}"
+            failures += compare(name, result, baseline[name], args.threshold)
+            if result['output_bytes'] != baseline[name]['output_bytes']:
+                print(f"  note: {name} output changed from {baseline[name]['output_bytes']} bytes")
+        print(f"{name:58} {result['ops_per_sec']:>11,.0f} {result['alloc_bytes']:>9} "
+              f"{result['output_bytes']:>8} {change:>8}")
+
+    if args.save_baseline:
+        # Merge, so a filtered run only replaces the cases it measured
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'saved_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'cases': dict(baseline, **results)}, f, indent=2, sort_keys=True)
+        print(f'Baseline saved to {args.baseline} ({len(results)} of {len(dict(baseline, **results))} cases updated)')
+        return
+
+    if not baseline:
+        print(f'No baseline at {args.baseline}; run with --save-baseline to create one')
+        sys.exit(0 if args.allow_missing_baseline else 2)
+
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print(f"Not in the baseline (not compared): {', '.join(missing)}")
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,369 @@
+"""End-to-end load test of the HTTP API, with no network services needed.
+
+Boots the app in a child process with the stub LLM replaying recorded
+stories (LLM_STUB_MODE=replay) and the silent TTS engine (TTS_BACKEND=silent),
+storing everything in a temporary directory. Virtual users then drive the
+real workflow over HTTP and the run reports latency percentiles and
+throughput per endpoint.
+
+Scenarios, mixed with --mix name=users,...:
+    author  create project, create story, preview each scene, edit a scene's
+            narration (and export the video with --export); repeat
+    editor  create one story, then loop previewing and moving characters
+    viewer  create one story, then loop previewing its scenes
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --mix author=4,editor=8,viewer=8 --duration 60 --llm-latency 2
+    python benchmarks/load_test.py --server asgi
+    python benchmarks/load_test.py --url http://localhost:5000   # a server already started with the stand-ins
+
+Exports are off by default: the synchronous export has no PNG frames until
+SVG frames are rasterized, so every export currently fails with 500. Pass
+--export once frames are rasterized (it also needs ffmpeg).
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_RECORDINGS = os.path.join(BACKEND_DIR, 'benchmarks', 'fixtures', 'recorded_stories.json')
+
+SCENARIOS = ('author', 'editor', 'viewer')
+
+PROMPTS = (
+    'a lost lantern in the woods',
+    'a pirate who finds a singing shell',
+    'an owl who cannot find his glasses',
+    'a kite stuck in a tree',
+    'a dragon who is afraid of the dark'
+)
+
+CHARACTER_IDS = ('hero', 'friend', 'villain', 'wise_one')
+EXPRESSIONS = ('happy', 'sad', 'surprised', 'neutral')
+
+REQUEST_TIMEOUT = 300
+
+
+class Recorder:
+    """Collect (latency, status) samples per endpoint from every virtual user"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, endpoint: str, seconds: float, status: int):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((seconds, status))
+
+    def report(self, elapsed: float) -> dict:
+        """Return {endpoint: summary} with counts, error counts, throughput and percentiles in ms"""
+        with self._lock:
+            samples = {endpoint: list(values) for endpoint, values in self.samples.items()}
+
+        summary = {}
+        for endpoint, values in sorted(samples.items()):
+            latencies = sorted(seconds for seconds, _ in values)
+            summary[endpoint] = {
+                'requests': len(values),
+                'errors': sum(1 for _, status in values if status >= 400 and status != 429),
+                'rejected': sum(1 for _, status in values if status == 429),
+                'throughput': round(len(values) / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+                'p90_ms': round(percentile(latencies, 90) * 1000, 1),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+                'max_ms': round(latencies[-1] * 1000, 1)
+            }
+        return summary
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class VirtualUser:
+    """One simulated client running a scenario until the deadline"""
+
+    def __init__(self, base_url: str, scenario: str, number: int, recorder: Recorder, deadline: float,
+                 think_time: float, export: bool):
+        self.base_url = base_url
+        self.scenario = scenario
+        self.number = number
+        self.recorder = recorder
+        self.deadline = deadline
+        self.think_time = think_time
+        self.export = export
+        self.iteration = 0
+        self.random = random.Random(f'{scenario}-{number}')
+
+    def run(self):
+        try:
+            if self.scenario == 'author':
+                while time.monotonic() < self.deadline:
+                    started_at = time.perf_counter()
+                    if self.author_workflow():
+                        self.recorder.add('workflow author', time.perf_counter() - started_at, 200)
+            else:
+                scenes = self.create_story()
+                while scenes and time.monotonic() < self.deadline:
+                    scene = self.random.choice(scenes)
+                    self.preview(scene['id'])
+                    if self.scenario == 'editor':
+                        self.move_characters(scene)
+                        self.preview(scene['id'])
+        except Exception as e:
+            print(f"Error in {self.scenario} user {self.number}: {e}")
+
+    def author_workflow(self) -> bool:
+        """Run the full authoring workflow once; return whether every step succeeded"""
+        scenes = self.create_story()
+        if not scenes:
+            return False
+        for scene in scenes:
+            if not self.preview(scene['id']):
+                return False
+        scene = self.random.choice(scenes)
+        status, _ = self.request('POST', '/api/animations/scenes/<scene_id>/update',
+                                 f"/api/animations/scenes/{scene['id']}/update",
+                                 {'narration': scene['narration'] + ' And then everyone went home for supper.'})
+        if status != 200:
+            return False
+        if self.export:
+            status, _ = self.request('POST', '/api/animations/export/<project_id>',
+                                     f"/api/animations/export/{scene['project_id']}", {})
+            return status == 200
+        return True
+
+    def create_story(self) -> list:
+        """Create a project and a story in it; return its scenes (with project_id), or [] on failure"""
+        self.iteration += 1
+        status, project = self.request('POST', '/api/projects/create', '/api/projects/create',
+                                       {'name': f'Load test {self.scenario} {self.number}.{self.iteration}'})
+        if status != 201:
+            return []
+
+        # A unique prompt per story, so the LLM response cache does not hide the LLM call
+        prompt = f'{self.random.choice(PROMPTS)} ({self.scenario} {self.number}.{self.iteration})'
+        status, story = self.request('POST', '/api/stories/create', '/api/stories/create',
+                                     {'project_id': project['project_id'], 'prompt': prompt})
+        if status != 201:
+            return []
+        return [dict(scene, project_id=project['project_id']) for scene in story['scenes']]
+
+    def preview(self, scene_id: str) -> bool:
+        """Fetch the scene's SVG preview; return whether it rendered"""
+        status, _ = self.request('GET', '/api/animations/preview/<scene_id>',
+                                 f'/api/animations/preview/{scene_id}')
+        return status == 200
+
+    def move_characters(self, scene: dict):
+        """Save a new cast layout, as the editor does after a drag"""
+        characters = [
+            {'character_id': character_id,
+             'position': {'x': round(self.random.uniform(0.1, 0.9), 2), 'y': 0.7},
+             'expression': self.random.choice(EXPRESSIONS)}
+            for character_id in self.random.sample(CHARACTER_IDS, self.random.randint(1, 3))
+        ]
+        self.request('POST', '/api/animations/scenes/<scene_id>/update',
+                     f"/api/animations/scenes/{scene['id']}/update", {'characters': characters})
+
+    def request(self, method: str, endpoint: str, path: str, body: dict = None):
+        """Send a request, retrying after 429 responses as a client would; return (status, parsed JSON or None)"""
+        if self.think_time:
+            time.sleep(self.random.uniform(0, 2 * self.think_time))
+
+        while True:
+            status, content, retry_after = self._send(method, endpoint, path, body)
+            if status != 429 or time.monotonic() + retry_after >= self.deadline:
+                return status, content
+            time.sleep(retry_after)
+
+    def _send(self, method: str, endpoint: str, path: str, body: dict = None):
+        """Send one request and record it under endpoint; return (status, parsed JSON or None, Retry-After)"""
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+        started_at = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+                status, headers, content = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, headers, content = e.code, e.headers, e.read()
+        except OSError as e:
+            self.recorder.add(f'{method} {endpoint}', time.perf_counter() - started_at, 599)
+            print(f"Error calling {method} {path}: {e}")
+            return 599, None, 0
+        self.recorder.add(f'{method} {endpoint}', time.perf_counter() - started_at, status)
+
+        if status >= 400 and status != 429:
+            print(f"{method} {path} returned {status}: {content[:200]!r}")
+        parsed = json.loads(content) if headers.get('Content-Type', '').startswith('application/json') else None
+        return status, parsed, float(headers.get('Retry-After') or 1)
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(','):
+        name, _, users = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}')
+        mix[name] = int(users or 1)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, workdir: str):
+    """Start the app with the LLM and TTS stand-ins; return (process, base URL)"""
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.getenv('PYTHONPATH')])),
+        LLM_BACKEND='stub',
+        LLM_STUB_MODE='replay',
+        LLM_STUB_REPLAY=args.recordings,
+        LLM_STUB_LATENCY=str(args.llm_latency),
+        LLM_STUB_LATENCY_JITTER=str(args.llm_jitter),
+        TTS_BACKEND='silent',
+        TTS_SILENT_REALTIME_FACTOR=str(args.tts_realtime_factor)
+    )
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', str(port), '--server', args.server],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    log.close()
+
+    base_url = f'http://127.0.0.1:{port}'
+    give_up_at = time.monotonic() + 60
+    while time.monotonic() < give_up_at:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}; see {workdir}/server.log')
+        try:
+            with urllib.request.urlopen(f'{base_url}/api/stories/characters', timeout=2):
+                return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'Server did not start in time; see {workdir}/server.log')
+
+
+def serve(port: int, server: str):
+    """Child process: run the app from the current (temporary) directory"""
+    workdir = os.getcwd()
+    from app.services.audio_service import AudioService
+    from app.services.story_generator import StoryGenerator
+    # Keep generated audio and cached LLM responses out of the real storage
+    AudioService.STORAGE_DIR = os.path.join(workdir, 'storage', 'audio')
+    StoryGenerator.LLM_CACHE_DIR = os.path.join(workdir, 'storage', 'llm_cache')
+
+    from app import create_app
+    from app.services.warmup import warm_up
+    app = create_app()
+    # Warm up before listening, so the load starts once the server is ready
+    warm_up()
+    if server == 'asgi':
+        import uvicorn
+        from app.asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(app), host='127.0.0.1', port=port, log_level='warning')
+    else:
+        from werkzeug.serving import run_simple
+        run_simple('127.0.0.1', port, app, threaded=True)
+
+
+def print_report(summary: dict, elapsed: float):
+    print(f"\n{'endpoint':52} {'reqs':>6} {'err':>4} {'429':>4} {'req/s':>7} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, row in summary.items():
+        print(f"{endpoint:52} {row['requests']:>6} {row['errors']:>4} {row['rejected']:>4} {row['throughput']:>7.2f} "
+              f"{row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+    requests = sum(row['requests'] for endpoint, row in summary.items() if not endpoint.startswith('workflow'))
+    print(f'\n{requests} requests in {elapsed:.1f}s ({requests / elapsed:.1f} req/s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('author=2,editor=4,viewer=4'),
+                        help='virtual users per scenario, e.g. author=2,editor=4,viewer=4')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to generate load')
+    parser.add_argument('--think-time', type=float, default=0, help='mean seconds a user waits between requests')
+    parser.add_argument('--export', action='store_true', help='add the export step to the author workflow')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='seconds the stub LLM takes per story')
+    parser.add_argument('--llm-jitter', type=float, default=0.5, help='extra random LLM latency, up to this many seconds')
+    parser.add_argument('--tts-realtime-factor', type=float, default=0.1,
+                        help='seconds of simulated synthesis per second of narration')
+    parser.add_argument('--recordings', default=DEFAULT_RECORDINGS, help='JSON file of recorded LLM responses')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+                        help='threaded Flask server, or uvicorn with the async routes')
+    parser.add_argument('--url', help='load an already running server instead of starting one')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary storage directory and server log')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.server)
+        return
+
+    workdir = process = None
+    base_url = args.url.rstrip('/') if args.url else None
+    if not base_url:
+        workdir = tempfile.mkdtemp(prefix='animation-load-test-')
+        process, base_url = start_server(args, workdir)
+        print(f'Server running at {base_url} (storage and log in {workdir})')
+
+    try:
+        # One untimed story first, so TTS worker start-up is not charged to the first users
+        VirtualUser(base_url, 'warmup', 0, Recorder(), time.monotonic() + 60, 0, False).create_story()
+
+        recorder = Recorder()
+        started_at = time.monotonic()
+        deadline = started_at + args.duration
+        users = [VirtualUser(base_url, scenario, number, recorder, deadline, args.think_time, args.export)
+                 for scenario, count in args.mix.items() for number in range(count)]
+        print(f"Running {', '.join(f'{count} {name}' for name, count in args.mix.items())} "
+              f"for {args.duration:.0f}s")
+
+        threads = [threading.Thread(target=user.run, daemon=True) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Users finish the request in flight after the deadline
+        elapsed = time.monotonic() - started_at
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = recorder.report(elapsed)
+    print_report(summary, elapsed)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'mix': args.mix, 'duration': round(elapsed, 2), 'endpoints': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Measure backend cold-start import time with `python -X importtime`.
+
+Imports the app package and every blueprint in a fresh interpreter, then
+fails (exit code 1) if the total exceeds the budget or if any module that
+should only load on first use was imported at startup.
+
+    python benchmarks/startup_importtime.py
+    python benchmarks/startup_importtime.py --budget-ms 300 --top 15
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed for the app and its blueprints
+DEFAULT_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', 400))
+
+# Heavy dependencies that must stay deferred until first use
+DEFERRED_MODULES = ('google.generativeai', 'pyttsx3', 'numpy')
+
+STARTUP_CODE = 'import app, app.routes'
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure(runs: int):
+    """Return (best total microseconds, {module: cumulative us}) over several runs"""
+    best_total, best_modules = None, None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr)
+
+        modules = {}
+        total = 0
+        for line in result.stderr.splitlines():
+            match = LINE.match(line)
+            if not match:
+                continue
+            cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+            modules[name] = cumulative
+            # Top-level imports (single leading space) sum to the whole startup cost
+            if len(indent) == 1:
+                total += cumulative
+        if best_total is None or total < best_total:
+            best_total, best_modules = total, modules
+    return best_total, best_modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=3, help='take the fastest of N fresh interpreters')
+    parser.add_argument('--top', type=int, default=10, help='list the N slowest modules')
+    args = parser.parse_args()
+
+    total_us, modules = measure(args.runs)
+    total_ms = total_us / 1000
+
+    print(f'Startup imports: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)')
+    print(f'Slowest {args.top} modules (cumulative):')
+    for name, cumulative in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f'startup import time {total_ms:.1f} ms exceeds budget of {args.budget_ms:.0f} ms')
+    for name in DEFERRED_MODULES:
+        if name in modules:
+            failures.append(f'{name} is imported at startup; it should load on first use')
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Gunicorn settings for the production server.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+Signals to the master process:
+    HUP   graceful reload: start fresh workers, let old ones finish their requests
+    TTOU  / TTIN  remove / add a worker
+    USR2  then WINCH and QUIT on the old master: upgrade to new code without downtime
+          (with preload_app the code lives in the master, so HUP alone does not reload it)
+"""
+import os
+import resource
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+
+# Threads let a worker keep serving while it streams SSE / NDJSON responses.
+# Keep this above the admission-controlled slots plus queues (8 by default)
+# so interactive requests always find a free thread.
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 16))
+
+# Import the app and build the render caches once, before forking
+preload_app = True
+pidfile = os.getenv('GUNICORN_PIDFILE')
+
+timeout = int(os.getenv('WORKER_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('WORKER_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers after a number of requests (jittered so they do not all restart together)
+max_requests = int(os.getenv('WORKER_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('WORKER_MAX_REQUESTS_JITTER', 100))
+
+# ...or as soon as a worker's resident memory grows past this many MiB (0 disables)
+MAX_WORKER_RSS_MB = int(os.getenv('MAX_WORKER_RSS_MB', 512))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+
+
+def worker_rss_mb() -> float:
+    """Current resident set size of this process, in MiB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def post_fork(server, worker):
+    # Thread and process pools are created per worker, never in the master
+    from app.services.warmup import start_warmup
+    start_warmup(delay=0)
+
+
+def post_request(worker, req, environ, resp):
+    if MAX_WORKER_RSS_MB and worker.alive:
+        rss = worker_rss_mb()
+        if rss > MAX_WORKER_RSS_MB:
+            worker.log.info('Worker %s using %.0f MiB (limit %d MiB); recycling', worker.pid, rss, MAX_WORKER_RSS_MB)
+            # Finish in-flight requests, then exit; the master starts a replacement
+            worker.alive = False
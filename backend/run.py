@@ -8,5 +8,9 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    from app.services.warmup import start_warmup
+    
     port = int(os.environ.get("PORT", 5000))
+    # Load the LLM SDK and TTS workers in the background once the server is up
+    start_warmup()
     app.run(host="0.0.0.0", port=port)
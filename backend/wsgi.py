@@ -0,0 +1,25 @@
+"""Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is loaded once in the gunicorn master (preload_app), so everything
+built here is shared copy-on-write by the forked workers.
+"""
+import gc
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app
+from app.services.warmup import build_render_caches
+
+app = create_app()
+
+# Backgrounds, character sprites and viseme tables never change once built
+stats = build_render_caches()
+print(f"Render caches ready: {stats['backgrounds']} backgrounds, {stats['sprites']} sprites "
+      f"({stats['bytes'] // 1024} KiB) in {stats['seconds']:.2f}s")
+
+# Keep the workers' garbage collections from writing to (and so copying)
+# the pages holding everything allocated before the fork
+gc.freeze()
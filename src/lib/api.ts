@@ -12,8 +12,21 @@ export const api = {
   getProject: (projectId: string) =>
     fetch(`${API_BASE}/projects/${projectId}`).then(r => r.json()),
 
-  listProjects: () =>
-    fetch(`${API_BASE}/projects`).then(r => r.json()),
+  // Follows X-Next-Cursor until every page has been read
+  listProjects: async () => {
+    const projects: any[] = [];
+    let cursor: string | null = null;
+    do {
+      const params = new URLSearchParams({ limit: '200' });
+      if (cursor) params.set('cursor', cursor);
+      const r = await fetch(`${API_BASE}/projects?${params}`);
+      const page = await r.json();
+      if (!r.ok) return page;
+      projects.push(...page);
+      cursor = r.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return projects;
+  },
 
   updateProject: (projectId: string, data: any) =>
     fetch(`${API_BASE}/projects/${projectId}/update`, {